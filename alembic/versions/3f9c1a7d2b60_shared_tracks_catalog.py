@@ -0,0 +1,124 @@
+"""shared tracks catalog
+
+Moves track metadata from per-user liked_tracks rows into a deduplicated
+tracks table referenced by liked_tracks and playlist_tracks.
+
+Revision ID: 3f9c1a7d2b60
+Revises:
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9c1a7d2b60"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns(table: str) -> set:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return set()
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS tracks (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            artist_name TEXT NOT NULL,
+            album_name TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+    if "track_name" in _columns("liked_tracks"):
+        op.execute("""
+            INSERT OR IGNORE INTO tracks (id, name, artist_name, album_name)
+            SELECT track_id, track_name, artist_name, album_name
+            FROM liked_tracks
+            ORDER BY id DESC;
+            """)
+        op.execute("""
+            CREATE TABLE liked_tracks_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                track_id TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (track_id) REFERENCES tracks (id),
+                UNIQUE(user_id, track_id)
+            );
+            """)
+        op.execute("""
+            INSERT INTO liked_tracks_new (id, user_id, track_id)
+            SELECT id, user_id, track_id FROM liked_tracks;
+            """)
+        op.execute("DROP TABLE liked_tracks;")
+        op.execute("ALTER TABLE liked_tracks_new RENAME TO liked_tracks;")
+
+    if _columns("playlist_tracks"):
+        op.execute("""
+            CREATE TABLE playlist_tracks_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                playlist_id INTEGER NOT NULL,
+                track_id TEXT NOT NULL,
+                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (playlist_id) REFERENCES playlists (id) ON DELETE CASCADE,
+                FOREIGN KEY (track_id) REFERENCES tracks (id),
+                UNIQUE(playlist_id, track_id)
+            );
+            """)
+        op.execute("""
+            INSERT INTO playlist_tracks_new (id, playlist_id, track_id, added_at)
+            SELECT id, playlist_id, track_id, added_at FROM playlist_tracks;
+            """)
+        op.execute("DROP TABLE playlist_tracks;")
+        op.execute("ALTER TABLE playlist_tracks_new RENAME TO playlist_tracks;")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        CREATE TABLE liked_tracks_old (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            track_id TEXT NOT NULL,
+            track_name TEXT NOT NULL,
+            artist_name TEXT NOT NULL,
+            album_name TEXT NOT NULL,
+            UNIQUE(user_id, track_id)
+        );
+        """)
+    op.execute("""
+        INSERT INTO liked_tracks_old
+            (id, user_id, track_id, track_name, artist_name, album_name)
+        SELECT lt.id, lt.user_id, lt.track_id, t.name, t.artist_name, t.album_name
+        FROM liked_tracks lt
+        JOIN tracks t ON t.id = lt.track_id;
+        """)
+    op.execute("DROP TABLE liked_tracks;")
+    op.execute("ALTER TABLE liked_tracks_old RENAME TO liked_tracks;")
+    op.execute("""
+        CREATE TABLE playlist_tracks_old (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            playlist_id INTEGER NOT NULL,
+            track_id TEXT NOT NULL,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (playlist_id) REFERENCES playlists (id) ON DELETE CASCADE,
+            UNIQUE(playlist_id, track_id)
+        );
+        """)
+    op.execute("""
+        INSERT INTO playlist_tracks_old (id, playlist_id, track_id, added_at)
+        SELECT id, playlist_id, track_id, added_at FROM playlist_tracks;
+        """)
+    op.execute("DROP TABLE playlist_tracks;")
+    op.execute("ALTER TABLE playlist_tracks_old RENAME TO playlist_tracks;")
+    op.execute("DROP TABLE tracks;")
@@ -0,0 +1,39 @@
+"""secondary indexes
+
+Revision ID: 8b2e4d6f0a13
+Revises: 3f9c1a7d2b60
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8b2e4d6f0a13"
+down_revision: Union[str, None] = "3f9c1a7d2b60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_playlists_user_created
+        ON playlists (user_id, created_at DESC, id, name);
+        """)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_liked_tracks_track ON liked_tracks (track_id);"
+    )
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_playlist_tracks_track
+        ON playlist_tracks (track_id);
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_playlist_tracks_track;")
+    op.execute("DROP INDEX IF EXISTS idx_liked_tracks_track;")
+    op.execute("DROP INDEX IF EXISTS idx_playlists_user_created;")
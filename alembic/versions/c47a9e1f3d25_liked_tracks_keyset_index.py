@@ -0,0 +1,29 @@
+"""liked tracks keyset index
+
+Revision ID: c47a9e1f3d25
+Revises: 8b2e4d6f0a13
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c47a9e1f3d25"
+down_revision: Union[str, None] = "8b2e4d6f0a13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_liked_tracks_user ON liked_tracks (user_id, id);"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_liked_tracks_user;")
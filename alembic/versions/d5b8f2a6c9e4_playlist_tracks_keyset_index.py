@@ -0,0 +1,30 @@
+"""playlist tracks keyset index
+
+Revision ID: d5b8f2a6c9e4
+Revises: c47a9e1f3d25
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d5b8f2a6c9e4"
+down_revision: Union[str, None] = "c47a9e1f3d25"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_playlist_tracks_playlist "
+        "ON playlist_tracks (playlist_id, id);"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_playlist_tracks_playlist;")
@@ -0,0 +1,67 @@
+"""library full-text index
+
+Revision ID: f2b4d6a8c0e1
+Revises: e1a3c5b7d9f2
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f2b4d6a8c0e1"
+down_revision: Union[str, None] = "e1a3c5b7d9f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS library (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            track_id TEXT NOT NULL,
+            UNIQUE(user_id, track_id)
+        );
+        """)
+    op.execute("CREATE INDEX IF NOT EXISTS idx_library_track ON library (track_id);")
+    op.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS library_fts USING fts5(
+            owner,
+            track_name,
+            artist_name,
+            album_name,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+        """)
+    op.execute("""
+        INSERT OR IGNORE INTO library (user_id, track_id)
+        SELECT user_id, track_id FROM liked_tracks
+        UNION
+        SELECT p.user_id, pt.track_id
+        FROM playlist_tracks pt
+        JOIN playlists p ON p.id = pt.playlist_id;
+        """)
+    op.execute("""
+        INSERT INTO library_fts (rowid, owner, track_name, artist_name, album_name)
+        SELECT
+            l.id,
+            l.user_id,
+            COALESCE(t.name, ''),
+            COALESCE(t.artist_name, ''),
+            COALESCE(t.album_name, '')
+        FROM library l
+        LEFT JOIN tracks t ON t.id = l.track_id
+        WHERE l.id NOT IN (SELECT rowid FROM library_fts);
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS library_fts;")
+    op.execute("DROP INDEX IF EXISTS idx_library_track;")
+    op.execute("DROP TABLE IF EXISTS library;")
@@ -6,4 +6,69 @@ load_dotenv()
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+# Base URL of a local Bot API server; empty means api.telegram.org.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
 DATABASE_URL = os.getenv("DATABASE_URL")
+
+SPOTIFY_POOL_SIZE = int(os.getenv("SPOTIFY_POOL_SIZE", "100"))
+SPOTIFY_TIMEOUT = float(os.getenv("SPOTIFY_TIMEOUT", "10"))
+SPOTIFY_BATCH_CONCURRENCY = int(os.getenv("SPOTIFY_BATCH_CONCURRENCY", "4"))
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+DB_READERS = int(os.getenv("DB_READERS", "4"))
+DB_CACHE_SIZE_KIB = int(os.getenv("DB_CACHE_SIZE_KIB", "65536"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_GROUP_COMMIT = os.getenv("DB_GROUP_COMMIT", "0") == "1"
+DB_COMMIT_BATCH_SIZE = int(os.getenv("DB_COMMIT_BATCH_SIZE", "100"))
+DB_COMMIT_INTERVAL = float(os.getenv("DB_COMMIT_INTERVAL", "0.005"))
+DB_TRANSACTION_TIMEOUT = float(os.getenv("DB_TRANSACTION_TIMEOUT", "2"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = float(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+TELEGRAM_GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", str(20 / 60)))
+TELEGRAM_SEND_RETRIES = int(os.getenv("TELEGRAM_SEND_RETRIES", "3"))
+
+INLINE_RESULTS = int(os.getenv("INLINE_RESULTS", "20"))
+INLINE_MIN_QUERY = int(os.getenv("INLINE_MIN_QUERY", "2"))
+INLINE_DEBOUNCE = float(os.getenv("INLINE_DEBOUNCE", "0.3"))
+INLINE_PREFIX_MIN_HITS = int(os.getenv("INLINE_PREFIX_MIN_HITS", "5"))
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+
+PREVIEW_CACHE_DIR = os.getenv("PREVIEW_CACHE_DIR", ".cache/previews")
+PREVIEW_CACHE_MAX_BYTES = int(
+    os.getenv("PREVIEW_CACHE_MAX_BYTES", str(512 * 1024 * 1024))
+)
+DISK_CACHE_PATH = os.getenv("DISK_CACHE_PATH", ".cache/results.sqlite3")
+DISK_CACHE_MAX_BYTES = int(os.getenv("DISK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+DISK_CACHE_FLUSH_INTERVAL = float(os.getenv("DISK_CACHE_FLUSH_INTERVAL", "1"))
+
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "100"))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))
+
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+WORKER_SHUTDOWN_TIMEOUT = float(os.getenv("WORKER_SHUTDOWN_TIMEOUT", "30"))
+
+EXECUTOR_CONCURRENCY = int(os.getenv("EXECUTOR_CONCURRENCY", "64"))
+
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1")
+SPOTIFY_TOKEN_URL = os.getenv(
+    "SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token"
+)
+SPOTIFY_CONCURRENCY_INITIAL = int(os.getenv("SPOTIFY_CONCURRENCY_INITIAL", "8"))
+SPOTIFY_CONCURRENCY_MAX = int(os.getenv("SPOTIFY_CONCURRENCY_MAX", "64"))
+SPOTIFY_LATENCY_TARGET = float(os.getenv("SPOTIFY_LATENCY_TARGET", "2"))
+SPOTIFY_MAX_RETRIES = int(os.getenv("SPOTIFY_MAX_RETRIES", "5"))
+
+SPOTIFY_BREAKER_FAILURES = int(os.getenv("SPOTIFY_BREAKER_FAILURES", "5"))
+SPOTIFY_BREAKER_RESET = float(os.getenv("SPOTIFY_BREAKER_RESET", "30"))
@@ -0,0 +1,253 @@
+"""
+Query-plan regression check.
+
+Runs every query issued by `src/telegram_bot/models.py` and the playlist handlers
+against a scratch SQLite database under EXPLAIN QUERY PLAN and exits with a
+non-zero status if any of them scans a whole table or sorts through a temporary
+b-tree instead of using an index.
+
+Usage (from the repository root):
+    python -m scripts.check_query_plans
+"""
+
+import asyncio
+import inspect
+import os
+import re
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from src.spotify.client import SpotifyAPI, get_spotify
+from src.telegram_bot import models, playlist_handlers
+from src.telegram_bot.database import Database, Transaction
+from src.utils.disk_cache import default_disk_cache
+
+# Queries that are expected to read the whole table.
+KNOWN_FULL_SCANS: set = set()
+
+# Virtual tables (FTS5 lookups, json_each over a parameter) are scanned by design.
+BAD_PLAN = re.compile(r"^SCAN (?!CONSTANT ROW)(?!\w+ VIRTUAL TABLE)|USE TEMP B-TREE")
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.split())
+
+
+class PlanRecordingDatabase(Database):
+    """
+    A Database that records the query plan of every statement it runs.
+    """
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.plans: dict = {}
+
+    async def _explain(self, query: str, params):
+        if self.connection is None:
+            raise RuntimeError("The database is not connected.")
+        async with self.connection.execute(
+            f"EXPLAIN QUERY PLAN {query}", params
+        ) as cursor:
+            rows = await cursor.fetchall()
+        self.plans[normalize(query)] = [row[-1] for row in rows]
+
+    async def execute(self, query: str, params: tuple = ()):
+        await self._explain(query, params)
+        return await super().execute(query, params)
+
+    async def executemany(self, query: str, params_seq: list):
+        if params_seq:
+            await self._explain(query, params_seq[0])
+        return await super().executemany(query, params_seq)
+
+    async def execute_returning(self, query: str, params: tuple = ()):
+        await self._explain(query, params)
+        return await super().execute_returning(query, params)
+
+    async def fetchone(self, query: str, params: tuple = ()):
+        await self._explain(query, params)
+        return await super().fetchone(query, params)
+
+    async def fetchall(self, query: str, params: tuple = ()):
+        await self._explain(query, params)
+        return await super().fetchall(query, params)
+
+    @asynccontextmanager
+    async def transaction(self):
+        async with super().transaction() as tx:
+            yield PlanRecordingTransaction(self, tx)
+
+
+class PlanRecordingTransaction:
+    """
+    Wraps a Transaction so that its statements are recorded as well.
+    """
+
+    def __init__(self, db: PlanRecordingDatabase, tx: Transaction):
+        self.db = db
+        self.tx = tx
+
+    async def execute(self, query: str, params: tuple = ()):
+        await self.db._explain(query, params)
+        return await self.tx.execute(query, params)
+
+    async def executemany(self, query: str, params_seq: list):
+        if params_seq:
+            await self.db._explain(query, params_seq[0])
+        return await self.tx.executemany(query, params_seq)
+
+    async def execute_returning(self, query: str, params: tuple = ()):
+        await self.db._explain(query, params)
+        return await self.tx.execute_returning(query, params)
+
+    async def fetchone(self, query: str, params: tuple = ()):
+        await self.db._explain(query, params)
+        return await self.tx.fetchone(query, params)
+
+    async def fetchall(self, query: str, params: tuple = ()):
+        await self.db._explain(query, params)
+        return await self.tx.fetchall(query, params)
+
+
+async def _noop(*args, **kwargs):
+    return None
+
+
+def fake_message(text: str, user_id: int = 1):
+    return SimpleNamespace(
+        text=text,
+        from_user=SimpleNamespace(id=user_id, username="user", first_name="User"),
+        reply=_noop,
+        answer=_noop,
+        edit_text=_noop,
+    )
+
+
+def fake_callback(data: str, user_id: int = 1):
+    return SimpleNamespace(
+        data=data,
+        from_user=SimpleNamespace(id=user_id),
+        message=fake_message("", user_id),
+        answer=_noop,
+    )
+
+
+async def exercise(db: Database):
+    """
+    Calls every model function and playlist handler at least once.
+    """
+    track = {"id": "track1", "name": "Track", "artists": [], "album": {}}
+    SpotifyAPI.get_track.cache_set(track, get_spotify(), "track1")
+
+    await models.save_user(db, 1, "user")
+    await models.is_user_authenticated(db, 1)
+    await models.is_user_authenticated(db, 2, set())
+    await models.save_track(db, "track1", "Track", "Artist", "Album")
+    await models.save_tracks(
+        db,
+        [
+            {
+                "track_id": "track2",
+                "track_name": "Track 2",
+                "artist_name": "Artist",
+                "album_name": "Album",
+            }
+        ],
+    )
+    await models.save_liked_track(db, 1, "track1", "Track", "Artist", "Album")
+    await models.get_liked_tracks_page(db, 1, 10)
+    await models.get_liked_tracks_page(db, 1, 10, before_id=5)
+    await models.get_liked_tracks_page(db, 1, 10, after_id=5)
+    await models.save_playlist(db, 1, "Mix")
+    await models.get_user_playlists_page(db, 1, 10, 1)
+    await models.get_playlist_name(db, 1)
+    await models.get_playlist_tracks_page(db, 1, 10)
+    await models.get_playlist_tracks_page(db, 1, 10, after_id=5)
+    await models.get_playlist_tracks_page(db, 1, 10, before_id=5)
+    await models.playlist_exists(db, 1, "Mix")
+    await models.add_track_to_user_playlist(db, 1, "Mix", "track1")
+    await models.remove_track_from_user_playlist(db, 1, "Mix", "track1")
+    await models.rename_playlist(db, 1, "Mix", "Mix 2")
+    await models.delete_playlist(db, 1, "Mix 2")
+    await models.search_library(db, 1, "tra art", 10)
+    await models.search_library(db, 1, "?!", 10)
+    await models.save_preview_file_id(db, "hash", "file")
+    await models.get_preview_file_id(db, "hash")
+    await models.delete_preview_file_id(db, "hash")
+
+    await playlist_handlers.create_playlist_handler(fake_message("/cp Rock"), db)
+    await playlist_handlers.add_to_playlist_handler(
+        fake_message("/add Rock track1"), db
+    )
+    await playlist_handlers.add_to_playlist_handler(
+        fake_message("/add Missing track1"), db
+    )
+    await playlist_handlers.view_playlists_handler(fake_message("/playlists"), db)
+    await playlist_handlers.show_playlist_callback_handler(
+        fake_callback("show_playlist:2"), db
+    )
+    await playlist_handlers.playlists_page_callback_handler(
+        fake_callback("playlists_page:0"), db
+    )
+    await playlist_handlers.playlist_tracks_callback_handler(
+        fake_callback("playlist_tracks:2:next:0"), db
+    )
+    await playlist_handlers.remove_from_playlist_handler(
+        fake_message("/remove Rock track1"), db
+    )
+    await playlist_handlers.rename_playlist_handler(fake_message("/rn Rock Pop"), db)
+    await playlist_handlers.delete_playlist_handler(fake_message("/del Pop"), db)
+
+
+def unexercised_functions() -> list:
+    """
+    Returns the model functions that `exercise` never calls. Private helpers
+    are covered through the functions that use them.
+    """
+    called = set(exercise.__code__.co_names)
+    return [
+        name
+        for name, func in inspect.getmembers(models, inspect.iscoroutinefunction)
+        if func.__module__ == models.__name__
+        and not name.startswith("_")
+        and name not in called
+    ]
+
+
+async def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = PlanRecordingDatabase(f"sqlite:///{os.path.join(tmp, 'plans.db')}")
+        default_disk_cache.path = os.path.join(tmp, "results.sqlite3")
+        await db.connect()
+        try:
+            await exercise(db)
+        finally:
+            await db.close()
+            await get_spotify().close()
+            await default_disk_cache.close()
+
+    failures = 0
+    for query, plan in db.plans.items():
+        bad = [step for step in plan if BAD_PLAN.search(step)]
+        status = "ok"
+        if bad and query in {normalize(q) for q in KNOWN_FULL_SCANS}:
+            status = "allowed"
+        elif bad:
+            status = "FAIL"
+            failures += 1
+        print(f"[{status}] {query}")
+        for step in plan:
+            print(f"        {step}")
+
+    for name in unexercised_functions():
+        print(f"[FAIL] {name} is not exercised by this check")
+        failures += 1
+
+    print(f"\n{len(db.plans)} queries checked, {failures} failing.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,123 @@
+"""
+Spotify rate-limiter check against a local stub server.
+
+Starts an aiohttp stub of the token and /tracks/{id} endpoints that answers 429
+with a Retry-After header whenever more than `--capacity` requests are in
+flight, then fires `--requests` concurrent `get_track` calls through a
+SpotifyAPI pointed at it. Exits with a non-zero status unless every call
+succeeds, the limiter saw 429s, and its window settled near the capacity.
+
+Usage (from the repository root):
+    python -m scripts.check_spotify_limiter [--capacity 5] [--requests 200]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+from aiohttp import web
+
+from src.spotify.client import SpotifyAPI
+from src.utils.disk_cache import default_disk_cache
+
+
+class Stub:
+    def __init__(self, capacity: int, retry_after: str, latency: float):
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.served = 0
+        self.throttled = 0
+
+    async def token(self, request: web.Request) -> web.Response:
+        return web.json_response({"access_token": "stub", "expires_in": 3600})
+
+    async def track(self, request: web.Request) -> web.Response:
+        if self.in_flight >= self.capacity:
+            self.throttled += 1
+            return web.Response(status=429, headers={"Retry-After": self.retry_after})
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        self.served += 1
+        return web.json_response({"id": request.match_info["id"], "name": "Track"})
+
+    async def start(self, port: int) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post("/api/token", self.token)
+        app.router.add_get("/v1/tracks/{id}", self.track)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        return runner
+
+
+async def run(args) -> int:
+    stub = Stub(args.capacity, args.retry_after, args.latency)
+    runner = await stub.start(args.port)
+    spotify = SpotifyAPI()
+    base = f"http://127.0.0.1:{args.port}"
+    spotify.TOKEN_URL = f"{base}/api/token"
+    spotify.TRACK_URL = f"{base}/v1/tracks"
+
+    async def report():
+        while True:
+            print(f"limiter: {spotify.limiter.stats()}")
+            await asyncio.sleep(0.5)
+
+    reporter = asyncio.create_task(report())
+    # Keep stub tracks out of the real persistent cache (and its hits out of
+    # later runs).
+    tmp = tempfile.TemporaryDirectory()
+    default_disk_cache.path = os.path.join(tmp.name, "results.sqlite3")
+    try:
+        results = await asyncio.gather(
+            *(spotify.get_track(f"track{i}") for i in range(args.requests)),
+            return_exceptions=True,
+        )
+    finally:
+        reporter.cancel()
+        await spotify.close()
+        await default_disk_cache.close()
+        tmp.cleanup()
+        await runner.cleanup()
+
+    errors = [r for r in results if isinstance(r, Exception)]
+    stats = spotify.limiter.stats()
+    print(f"\nfinal limiter state: {stats}")
+    print(
+        f"stub: served {stub.served}, answered 429 {stub.throttled} times, "
+        f"peak concurrency {stub.peak}"
+    )
+
+    failures = []
+    if errors:
+        failures.append(f"{len(errors)} calls failed, e.g. {errors[0]!r}")
+    if not stats["throttled"]:
+        failures.append("the limiter never saw a 429")
+    if stats["window"] > 2 * args.capacity:
+        failures.append(f"window {stats['window']} did not settle near capacity")
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--capacity", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--retry-after", default="1")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8771)
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
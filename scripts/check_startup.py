@@ -0,0 +1,131 @@
+"""
+Startup-time check.
+
+Starts the bot in fresh interpreters with Spotify unreachable and measures the
+time from the first import of `src.telegram_bot.bot` until it is ready to
+receive updates (handlers registered, database open, Spotify warmup started in
+the background). Exits with a non-zero status if startup fails offline, opens a
+Spotify session or requests a token before it is ready, or the median ready
+time exceeds the budget (about 1.5x the measured median of ~4 s).
+
+Usage (from the repository root):
+    python -m scripts.check_startup [--runs 3] [--budget 6]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Nothing listens on the discard port, so every Spotify request fails at once.
+OFFLINE_URL = "http://127.0.0.1:9"
+
+
+def spotify_touched() -> bool:
+    """
+    Whether the shared Spotify client has opened a session or asked for a token.
+    """
+    from src.spotify import client
+
+    spotify = client._shared
+    if spotify is None:
+        return False
+    tokens = spotify._tokens
+    return (
+        spotify._session is not None
+        or tokens.token is not None
+        or tokens._refresh_task is not None
+    )
+
+
+async def child():
+    started = time.perf_counter()
+    from src.telegram_bot import bot as app
+
+    imported = time.perf_counter()
+    app.register_handlers(app.dp)
+    db = await app._open_resources()
+    await app.warm_up_spotify()
+    ready = time.perf_counter()
+    # The warmup task has been scheduled but has not run yet.
+    touched = spotify_touched()
+    try:
+        await asyncio.gather(*app._background_tasks)
+    finally:
+        await app._close_resources(db)
+    print(
+        json.dumps(
+            {
+                "import": imported - started,
+                "ready": ready - started,
+                "spotify_touched": touched,
+            }
+        )
+    )
+
+
+def run_once(tmp: str) -> dict:
+    env = dict(
+        os.environ,
+        TELEGRAM_BOT_TOKEN=os.getenv("TELEGRAM_BOT_TOKEN") or "123456:startup-check",
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+        DISK_CACHE_PATH=os.path.join(tmp, "results.sqlite3"),
+        SPOTIFY_API_URL=f"{OFFLINE_URL}/v1",
+        SPOTIFY_TOKEN_URL=f"{OFFLINE_URL}/api/token",
+    )
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "scripts.check_startup", "--child"],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    total = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1:])
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process"] = total
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument(
+        "--budget", type=float, default=6.0, help="max median ready time, s"
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(child())
+        return 0
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.runs):
+            try:
+                timings = run_once(tmp)
+            except RuntimeError as e:
+                print(f"run {i + 1}: startup failed offline: {e}")
+                return 1
+            if timings["spotify_touched"]:
+                print(f"run {i + 1}: Spotify was contacted before the bot was ready")
+                return 1
+            runs.append(timings)
+            print(
+                f"run {i + 1}: import {timings['import']:.2f}s, "
+                f"ready {timings['ready']:.2f}s, process {timings['process']:.2f}s"
+            )
+
+    ready = statistics.median(run["ready"] for run in runs)
+    print(f"\nmedian ready time {ready:.2f}s (budget {args.budget:.2f}s)")
+    return 0 if ready <= args.budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
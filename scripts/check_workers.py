@@ -0,0 +1,277 @@
+"""
+Multi-process mode check.
+
+Runs the bot's own worker entrypoint (`run_worker`) in a WorkerPool against a
+scratch database, a local stub of the Telegram Bot API (see TELEGRAM_API_URL)
+and the Spotify stub from `scripts.load_test`, feeds updates through the
+supervisor's routing middleware and checks that:
+- every worker received updates, and a user's updates from a private chat
+  and from a group go to the same worker,
+- the replies in each private chat came in the order the messages were sent,
+- sends to a group chat whose members are spread over the workers stayed within
+  the group rate limit,
+- every preview was delivered and the shared preview cache directory stayed
+  within its size budget.
+
+Usage (from the repository root):
+    python -m scripts.check_workers [--workers 4] [--users 50] [--messages 5]
+        [--group-messages 12] [--previews 40]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Tuple
+
+from aiohttp import web
+
+from scripts.load_test import SpotifyStub
+
+BOT_TOKEN = "123456:workers-check"
+GROUP_CHAT_ID = -100123
+GROUP_RATE = 4.0
+CHAT_BURST = 2
+PREVIEW_SIZE = 50_000
+PREVIEW_BUDGET = 5 * PREVIEW_SIZE
+
+
+def quiet_bot_worker(index: int, workers: int, queue, group_limits):
+    # The bot logs every query at INFO; basicConfig only takes the first call.
+    logging.basicConfig(level=logging.WARNING)
+    from src.telegram_bot.supervisor import _run_bot_worker
+
+    _run_bot_worker(index, workers, queue, group_limits)
+
+
+class TelegramStub:
+    """
+    Local stand-in for the Bot API that answers every call and records the
+    sends: (time, method, chat id, id of the message replied to). Also serves
+    the preview files the Spotify stub links to.
+    """
+
+    def __init__(self):
+        self.sends: List[Tuple[float, str, int, int]] = []
+        self._message_ids = iter(range(1, 10**9))
+
+    async def call(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if not method.startswith("send"):
+            return web.json_response({"ok": True, "result": True})
+        fields = await request.post()
+        chat_id = int(str(fields["chat_id"]))
+        reply = json.loads(str(fields.get("reply_parameters") or "{}"))
+        self.sends.append(
+            (time.monotonic(), method, chat_id, reply.get("message_id", 0))
+        )
+        message_id = next(self._message_ids)
+        result = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {
+                "id": chat_id,
+                "type": "private" if chat_id > 0 else "supergroup",
+            },
+        }
+        if method == "sendAudio":
+            result["audio"] = {
+                "file_id": f"audio{message_id}",
+                "file_unique_id": f"unique{message_id}",
+                "duration": 30,
+            }
+        return web.json_response({"ok": True, "result": result})
+
+    async def preview(self, request: web.Request) -> web.Response:
+        return web.Response(body=b"\0" * PREVIEW_SIZE, content_type="audio/mpeg")
+
+    async def start(self, port: int) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.call)
+        app.router.add_get("/previews/{name}", self.preview)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        return runner
+
+
+class PreviewSpotifyStub(SpotifyStub):
+    """
+    The load-test Spotify stub, with a preview for every track.
+    """
+
+    def __init__(self, preview_base: str):
+        super().__init__(latency=0.005, error_rate=0, seed=1)
+        self.preview_base = preview_base
+
+    def track(self, track_id: str) -> dict:
+        track = super().track(track_id)
+        track["preview_url"] = f"{self.preview_base}/previews/{track_id}.mp3"
+        return track
+
+
+def make_update(update_id: int, chat_id: int, user_id: int, text: str):
+    from aiogram.types import Update
+
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {
+                    "id": chat_id,
+                    "type": "private" if chat_id > 0 else "supergroup",
+                },
+                "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+                "text": text,
+                "entities": [
+                    {"type": "bot_command", "offset": 0, "length": len(text.split()[0])}
+                ],
+            },
+        }
+    )
+
+
+async def feed(pool, args) -> int:
+    """
+    Routes the updates to the workers and returns how many replies to expect.
+    """
+    from aiogram import Bot, Dispatcher
+
+    from src.telegram_bot.supervisor import RoutingMiddleware
+
+    dp = Dispatcher()
+    dp.update.outer_middleware(RoutingMiddleware(pool))
+    bot = Bot(BOT_TOKEN)
+    update_ids = iter(range(1, 10**9))
+
+    async def send(chat_id: int, user_id: int, text: str):
+        await dp.feed_update(bot, make_update(next(update_ids), chat_id, user_id, text))
+
+    try:
+        for seq in range(args.messages):
+            for user_id in range(1, args.users + 1):
+                await send(user_id, user_id, f"/find word{seq}")
+        for i in range(args.group_messages):
+            await send(GROUP_CHAT_ID, 1000 + i, f"/find group{i}")
+        for i in range(args.previews):
+            await send(5000 + i, 5000 + i, f"/play preview {i}")
+    finally:
+        await bot.session.close()
+    return args.users * args.messages + args.group_messages + args.previews
+
+
+def check_group_rate(times: List[float]) -> List[str]:
+    # A token bucket allows its burst plus `rate` per second, with some slack
+    # for timing jitter.
+    times = sorted(times)
+    for i, first in enumerate(times):
+        for j in range(i + 1, len(times)):
+            allowed = CHAT_BURST + GROUP_RATE * (times[j] - first) + 1
+            if j - i + 1 > allowed:
+                return [
+                    f"{j - i + 1} sends to the group chat within "
+                    f"{times[j] - first:.2f}s, at most {allowed:.0f} allowed"
+                ]
+    return []
+
+
+async def run(args, tmp: str) -> int:
+    from src.telegram_bot.supervisor import WorkerPool, user_key
+
+    telegram = TelegramStub()
+    telegram_runner = await telegram.start(args.telegram_port)
+    spotify = PreviewSpotifyStub(f"http://127.0.0.1:{args.telegram_port}")
+    spotify_runner = await spotify.start(args.spotify_port)
+
+    pool = WorkerPool(args.workers, quiet_bot_worker)
+    pool.start()
+    loop = asyncio.get_running_loop()
+    try:
+        expected = await feed(pool, args)
+        deadline = loop.time() + args.timeout
+        while len(telegram.sends) < expected and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+    finally:
+        await loop.run_in_executor(None, pool.stop, 30)
+        await spotify_runner.cleanup()
+        await telegram_runner.cleanup()
+
+    failures = []
+    routed = pool.stats()["routed"]
+    if not all(routed):
+        failures.append(f"not every worker received updates: {routed}")
+    private, group = make_update(1, 7, 7, "/find a"), make_update(
+        2, GROUP_CHAT_ID, 7, "/find a"
+    )
+    if pool.ring.get(user_key(private)) != pool.ring.get(user_key(group)):
+        failures.append("a user's private and group updates go to different workers")
+    if len(telegram.sends) != expected:
+        failures.append(f"{len(telegram.sends)} replies sent, {expected} expected")
+
+    replies = defaultdict(list)
+    for _, method, chat_id, reply_to in sorted(telegram.sends):
+        replies[chat_id].append(reply_to)
+    for chat_id in range(1, args.users + 1):
+        if replies[chat_id] != sorted(replies[chat_id]):
+            failures.append(f"chat {chat_id} answered out of order")
+
+    failures += check_group_rate(
+        [sent for sent, _, chat_id, _ in telegram.sends if chat_id == GROUP_CHAT_ID]
+    )
+
+    audio = sum(1 for _, method, _, _ in telegram.sends if method == "sendAudio")
+    if audio != args.previews:
+        failures.append(f"{audio} previews sent, {args.previews} expected")
+    cached = sum(p.stat().st_size for p in Path(tmp, "previews").glob("*.mp3"))
+    if cached > PREVIEW_BUDGET:
+        failures.append(f"preview cache holds {cached} bytes, budget {PREVIEW_BUDGET}")
+
+    print(f"routed per worker: {routed}")
+    print(f"telegram sends: {len(telegram.sends)}, previews cached: {cached} bytes")
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+    print(f"{expected} updates, {len(failures)} failing.")
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--group-messages", type=int, default=12)
+    parser.add_argument("--previews", type=int, default=40)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--telegram-port", type=int, default=8768)
+    parser.add_argument("--spotify-port", type=int, default=8769)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The workers are spawned, so they read their settings from this environment.
+        os.environ.update(
+            TELEGRAM_BOT_TOKEN=BOT_TOKEN,
+            TELEGRAM_API_URL=f"http://127.0.0.1:{args.telegram_port}",
+            TELEGRAM_GLOBAL_RATE="1000",
+            TELEGRAM_CHAT_RATE="50",
+            TELEGRAM_CHAT_BURST=str(CHAT_BURST),
+            TELEGRAM_GROUP_RATE=str(GROUP_RATE),
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'workers.db')}",
+            DISK_CACHE_PATH=os.path.join(tmp, "results.sqlite3"),
+            PREVIEW_CACHE_DIR=os.path.join(tmp, "previews"),
+            PREVIEW_CACHE_MAX_BYTES=str(PREVIEW_BUDGET),
+            SPOTIFY_API_URL=f"http://127.0.0.1:{args.spotify_port}/v1",
+            SPOTIFY_TOKEN_URL=f"http://127.0.0.1:{args.spotify_port}/api/token",
+        )
+        return asyncio.run(run(args, tmp))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""
+End-to-end load test of the dispatcher.
+
+Feeds synthetic updates (a configurable mix of /search, like callbacks, /likes
+and /playlists from many users) through the dispatcher from `bot.py` with its
+middlewares and handlers, against a scratch database, a fake Telegram session
+that records sends instead of making requests, and a local stub of the Spotify
+endpoints with configurable latency and error rate. Reports throughput and
+p50/p95/p99 latency per update kind, and exits with a non-zero status if the
+optional --max-p95 / --min-throughput thresholds are not met.
+
+Usage (from the repository root):
+    python -m scripts.load_test [--updates 2000] [--users 200] [--concurrency 50]
+        [--mix search=4,like=3,likes=2,playlists=1] [--spotify-latency 0.05]
+        [--spotify-error-rate 0] [--rate UPDATES_PER_SECOND] [--send-limits]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+from aiohttp import web
+
+KINDS = ("search", "like", "likes", "playlists")
+
+
+class SpotifyStub:
+    """
+    Local stand-in for the Spotify token, search and track endpoints. Every
+    response takes `latency` seconds (±50%), and `error_rate` of them are 500s.
+    """
+
+    def __init__(self, latency: float, error_rate: float, seed: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests: Counter[str] = Counter()
+        self.errors = 0
+
+    def track(self, track_id: str) -> dict:
+        return {
+            "id": track_id,
+            "name": f"Track {track_id}",
+            "artists": [{"name": f"Artist {track_id[:2]}"}],
+            "album": {"name": f"Album {track_id[:3]}"},
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+            "preview_url": None,
+        }
+
+    async def _respond(self, kind: str, body) -> web.Response:
+        self.requests[kind] += 1
+        await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=500)
+        return web.json_response(body)
+
+    async def token(self, request: web.Request) -> web.Response:
+        return await self._respond(
+            "token", {"access_token": "stub", "expires_in": 3600}
+        )
+
+    async def search(self, request: web.Request) -> web.Response:
+        query = request.query.get("q", "")
+        prefix = hashlib.sha1(query.encode()).hexdigest()[:8]
+        limit = int(request.query.get("limit", "10"))
+        items = [self.track(f"{prefix}{i}") for i in range(limit)]
+        return await self._respond("search", {"tracks": {"items": items}})
+
+    async def get_track(self, request: web.Request) -> web.Response:
+        return await self._respond("track", self.track(request.match_info["id"]))
+
+    async def get_tracks(self, request: web.Request) -> web.Response:
+        ids = request.query.get("ids", "").split(",")
+        return await self._respond(
+            "tracks", {"tracks": [self.track(track_id) for track_id in ids]}
+        )
+
+    async def start(self, port: int) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post("/api/token", self.token)
+        app.router.add_get("/v1/search", self.search)
+        app.router.add_get("/v1/tracks", self.get_tracks)
+        app.router.add_get("/v1/tracks/{id}", self.get_track)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        return runner
+
+
+def make_fake_session():
+    """
+    Builds an aiogram session that records every API call and answers it
+    locally: with True for methods returning bool and with a Message otherwise.
+    """
+    from aiogram.client.session.base import BaseSession
+    from aiogram.types import Chat, Message
+
+    class FakeSession(BaseSession):
+        def __init__(self):
+            super().__init__()
+            self.sent = Counter()
+            self._message_ids = itertools.count(1)
+
+        async def make_request(self, bot, method, timeout=None):
+            self.sent[method.__api_method__] += 1
+            if method.__returning__ is bool:
+                return True
+            chat_id = getattr(method, "chat_id", None) or 1
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=chat_id, type="private"),
+                text=getattr(method, "text", None),
+            )
+
+        async def stream_content(self, url, headers=None, timeout=30, **kwargs):
+            yield b""
+
+        async def close(self):
+            pass
+
+    return FakeSession()
+
+
+class UpdateGenerator:
+    """
+    Produces Telegram updates from `users` users in the proportions of `mix`.
+    Searches draw from `queries` distinct queries and likes from `tracks`
+    distinct tracks, which sets how often the caches can answer.
+    """
+
+    def __init__(
+        self, users: int, mix: Dict[str, int], queries: int, tracks: int, seed: int
+    ):
+        self.users = users
+        self.kinds = [kind for kind in KINDS if mix.get(kind)]
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.queries = queries
+        self.tracks = tracks
+        self.random = random.Random(seed)
+        self._update_ids = itertools.count(1)
+
+    def _message(self, user_id: int, text: str) -> dict:
+        return {
+            "message_id": next(self._update_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+            "text": text,
+            "entities": [
+                {"type": "bot_command", "offset": 0, "length": len(text.split()[0])}
+            ],
+        }
+
+    def next(self):
+        from aiogram.types import Update
+
+        kind = self.random.choices(self.kinds, self.weights)[0]
+        user_id = self.random.randint(1, self.users)
+        update_id = next(self._update_ids)
+        if kind == "like":
+            track_id = f"track{self.random.randrange(self.tracks)}"
+            payload = {
+                "update_id": update_id,
+                "callback_query": {
+                    "id": str(update_id),
+                    "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+                    "chat_instance": str(user_id),
+                    "data": f"like:{track_id}",
+                },
+            }
+        elif kind == "search":
+            query = f"query {self.random.randrange(self.queries)}"
+            payload = {
+                "update_id": update_id,
+                "message": self._message(user_id, f"/search track {query}"),
+            }
+        else:
+            payload = {
+                "update_id": update_id,
+                "message": self._message(user_id, f"/{kind}"),
+            }
+        return kind, Update.model_validate(payload)
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"unknown update kind: {kind}")
+        mix[kind] = int(weight or 1)
+    return mix
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def format_latencies(values: List[float]) -> str:
+    return (
+        f"p50 {percentile(values, 0.50) * 1000:7.1f} ms  "
+        f"p95 {percentile(values, 0.95) * 1000:7.1f} ms  "
+        f"p99 {percentile(values, 0.99) * 1000:7.1f} ms  "
+        f"max {max(values, default=0) * 1000:7.1f} ms"
+    )
+
+
+async def feed(app, bot, generator: UpdateGenerator, args) -> dict:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Counter[str] = Counter()
+    remaining = iter(range(args.updates))
+
+    async def feed_one(kind: str, update):
+        started = time.perf_counter()
+        try:
+            await app.dp.feed_update(bot, update)
+        except Exception as e:
+            errors[f"{kind}: {type(e).__name__}"] += 1
+        latencies[kind].append(time.perf_counter() - started)
+
+    async def closed_loop_worker():
+        for _ in remaining:
+            await feed_one(*generator.next())
+
+    started = time.perf_counter()
+    if args.rate:
+        # Open loop: updates arrive at a fixed rate however slow the handlers are.
+        tasks = []
+        for i in range(args.updates):
+            delay = started + i / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(feed_one(*generator.next())))
+        await asyncio.gather(*tasks)
+    else:
+        await asyncio.gather(*(closed_loop_worker() for _ in range(args.concurrency)))
+    return {
+        "duration": time.perf_counter() - started,
+        "latencies": latencies,
+        "errors": errors,
+    }
+
+
+async def run(args) -> int:
+    from src.spotify.client import get_spotify
+    from src.telegram_bot import bot as app
+    from src.utils.cache import default_cache
+    from src.utils.disk_cache import default_disk_cache
+
+    logging.getLogger().setLevel(args.log_level)
+
+    stub = SpotifyStub(args.spotify_latency, args.spotify_error_rate, args.seed)
+    runner = await stub.start(args.port)
+
+    session = make_fake_session()
+    if args.send_limits:
+        session.middleware(app.send_scheduler)
+    bot = app.Bot(token=os.environ["TELEGRAM_BOT_TOKEN"], session=session)
+
+    app.register_handlers(app.dp)
+    db = await app._open_resources()
+    generator = UpdateGenerator(
+        args.users, args.mix, args.queries, args.tracks, args.seed
+    )
+    try:
+        result = await feed(app, bot, generator, args)
+        executor_stats = app.executor.stats()
+        cache_stats = default_cache.stats()
+        disk_stats = default_disk_cache.stats()
+        breaker_stats = get_spotify().breaker.stats()
+    finally:
+        await app._close_resources(db)
+        await runner.cleanup()
+
+    all_latencies = [v for values in result["latencies"].values() for v in values]
+    throughput = len(all_latencies) / result["duration"]
+    print(
+        f"{len(all_latencies)} updates in {result['duration']:.2f}s: "
+        f"{throughput:.1f} updates/s"
+    )
+    print(f"  {'all':<10} {format_latencies(all_latencies)}")
+    for kind in KINDS:
+        if result["latencies"].get(kind):
+            values = result["latencies"][kind]
+            print(f"  {kind:<10} {format_latencies(values)}  n={len(values)}")
+    print(f"errors: {dict(result['errors']) or 0}")
+    print(f"superseded: {executor_stats['superseded']}")
+    print(f"telegram calls: {dict(session.sent)}")
+    print(f"spotify stub: {dict(stub.requests)}, errors {stub.errors}")
+    print(f"spotify breaker: {breaker_stats['state']}")
+    print(
+        f"memory cache: hits {cache_stats['hits']}, misses {cache_stats['misses']}; "
+        f"disk cache: hits {disk_stats['hits']}, misses {disk_stats['misses']}"
+    )
+
+    failed = False
+    p95 = percentile(all_latencies, 0.95)
+    if args.max_p95 is not None and p95 > args.max_p95:
+        print(f"FAIL: p95 {p95 * 1000:.1f} ms exceeds {args.max_p95 * 1000:.1f} ms")
+        failed = True
+    if args.min_throughput is not None and throughput < args.min_throughput:
+        print(f"FAIL: throughput below {args.min_throughput:.1f} updates/s")
+        failed = True
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--rate", type=float, help="feed updates at this rate instead of closed-loop"
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix("search=4,like=3,likes=2,playlists=1"),
+    )
+    parser.add_argument("--queries", type=int, default=500, help="distinct queries")
+    parser.add_argument("--tracks", type=int, default=1000, help="distinct tracks")
+    parser.add_argument("--spotify-latency", type=float, default=0.05)
+    parser.add_argument("--spotify-error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--send-limits",
+        action="store_true",
+        help="apply the Telegram send rate limits to the fake session",
+    )
+    parser.add_argument("--max-p95", type=float, help="fail above this p95, s")
+    parser.add_argument("--min-throughput", type=float, help="fail below, updates/s")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Settings are read on import, so the environment has to be ready first.
+        os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:load-test")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        os.environ["DISK_CACHE_PATH"] = os.path.join(tmp, "results.sqlite3")
+        os.environ["PREVIEW_CACHE_DIR"] = os.path.join(tmp, "previews")
+        os.environ["SPOTIFY_API_URL"] = f"http://127.0.0.1:{args.port}/v1"
+        os.environ["SPOTIFY_TOKEN_URL"] = f"http://127.0.0.1:{args.port}/api/token"
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
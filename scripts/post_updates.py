@@ -0,0 +1,76 @@
+"""
+Sends recorded Telegram updates to a locally running webhook server.
+
+Start the bot with BOT_MODE=webhook (leave WEBHOOK_URL empty to skip
+registering the webhook with Telegram), then run from the repository root:
+    python -m scripts.post_updates updates.jsonl [more files...]
+
+Each file holds one update object, a JSON array of updates, or one update per
+line. The script prints the status of every response and the ack latency.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import aiohttp
+
+from config.settings import WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET
+
+
+def load_updates(path: Path) -> list:
+    text = path.read_text(encoding="utf-8").strip()
+    if not text:
+        return []
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return data if isinstance(data, list) else [data]
+
+
+async def post_all(url: str, updates: list, concurrency: int) -> int:
+    headers = {}
+    if WEBHOOK_SECRET:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = WEBHOOK_SECRET
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def post(session: aiohttp.ClientSession, update: dict):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            async with session.post(url, json=update, headers=headers) as response:
+                await response.read()
+                elapsed = (time.perf_counter() - started) * 1000
+                if response.status != 200:
+                    failures += 1
+                print(
+                    f"update {update.get('update_id')}: "
+                    f"{response.status} in {elapsed:.1f} ms"
+                )
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(post(session, update) for update in updates))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument(
+        "--url", default=f"http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    updates = [update for path in args.files for update in load_updates(path)]
+    failures = asyncio.run(post_all(args.url, updates, args.concurrency))
+    print(f"\n{len(updates)} updates sent, {failures} not acknowledged.")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
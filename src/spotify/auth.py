@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+
+class TokenManager:
+    """
+    Keeps a Client Credentials access token fresh and shares it between callers.
+    - fetch_token: Coroutine function returning the raw token payload
+      (``access_token`` and ``expires_in``).
+    - refresh_margin: How many seconds before expiry the background refresh fires.
+    - jitter: Random spread, in seconds, subtracted from the refresh moment so that
+      several processes do not all hit the token endpoint at the same instant.
+    - retry_delay: Delay before retrying a failed background refresh.
+    """
+
+    def __init__(
+        self,
+        fetch_token: Callable[[], Awaitable[dict]],
+        refresh_margin: float = 300,
+        jitter: float = 60,
+        retry_delay: float = 10,
+    ):
+        self._fetch_token = fetch_token
+        self._refresh_margin = refresh_margin
+        self._jitter = jitter
+        self._retry_delay = retry_delay
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def token(self) -> Optional[str]:
+        return self._token
+
+    @property
+    def expires_in(self) -> float:
+        """
+        Seconds left until the current token expires (0 if there is none).
+        """
+        return max(self._expires_at - time.monotonic(), 0.0)
+
+    def is_valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._expires_at
+
+    async def get_token(self) -> str:
+        """
+        Returns a valid token, fetching one only if none is cached or it has expired.
+        """
+        if self.is_valid():
+            return self._token  # type: ignore[return-value]
+        return await self.refresh()
+
+    async def refresh(self, stale_token: Optional[str] = None) -> str:
+        """
+        Forces a refresh, joining the one already in flight if there is one.
+        - stale_token: The token a caller saw rejected. If another caller has
+          already replaced it, the new token is returned without a request.
+        """
+        if stale_token is not None and stale_token != self._token and self.is_valid():
+            return self._token  # type: ignore[return-value]
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._do_refresh())
+        return await asyncio.shield(self._refresh_task)
+
+    async def _do_refresh(self) -> str:
+        payload = await self._fetch_token()
+        token = payload["access_token"]
+        expires_in = float(payload.get("expires_in", 3600))
+        self._token = token
+        self._expires_at = time.monotonic() + expires_in
+        delay = expires_in - self._refresh_margin - random.uniform(0, self._jitter)
+        self._schedule(max(delay, self._retry_delay))
+        logging.info(f"Spotify token обновлён, истекает через {expires_in:.0f} с.")
+        return token
+
+    def _schedule(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(delay, self._background_refresh)
+
+    def _background_refresh(self):
+        self._timer = None
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.ensure_future(self._do_refresh())
+        self._refresh_task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: asyncio.Task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            return
+        logging.warning(f"Не удалось обновить Spotify token в фоне: {error}")
+        if self._timer is None:
+            self._schedule(self._retry_delay)
+
+    def close(self):
+        """
+        Cancels the scheduled and in-flight refreshes.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        self._refresh_task = None
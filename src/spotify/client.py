@@ -1,60 +1,348 @@
-import requests
+import asyncio
+import logging
+from typing import Iterable, List, Optional
+
+import aiohttp
+from src.spotify.auth import TokenManager
+from src.spotify.limiter import AdaptiveLimiter
+from src.spotify.previews import PreviewCache
 from src.utils.cache import cache_res
-from config.settings import SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET
+from src.utils.circuit import CircuitBreaker, CircuitOpenError
+from src.utils.disk_cache import default_disk_cache
+from src.utils.singleflight import SingleFlight
+from config.settings import (
+    SPOTIFY_API_URL,
+    SPOTIFY_BATCH_CONCURRENCY,
+    SPOTIFY_BREAKER_FAILURES,
+    SPOTIFY_BREAKER_RESET,
+    SPOTIFY_CLIENT_ID,
+    SPOTIFY_CLIENT_SECRET,
+    SPOTIFY_MAX_RETRIES,
+    SPOTIFY_POOL_SIZE,
+    SPOTIFY_TIMEOUT,
+    SPOTIFY_TOKEN_URL,
+)
+
+
+class SpotifyUnavailableError(Exception):
+    """
+    Spotify cannot be used right now; the message can be shown to the user.
+    """
+
+
+class SpotifyRateLimitError(SpotifyUnavailableError):
+    """
+    Spotify kept answering 429 after all retries.
+    """
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500
+    return True
+
+
+def _retry_after(response: aiohttp.ClientResponse) -> float:
+    try:
+        return max(float(response.headers.get("Retry-After", "1")), 0.0)
+    except ValueError:
+        return 1.0
 
 
 class SpotifyAPI:
     """
-    A reusable client for interacting with the Spotify API.
+    A reusable asynchronous client for interacting with the Spotify API.
     Handles authentication and provides methods for querying tracks, playlists, and more.
+    All requests share one pooled keep-alive aiohttp session, so lookups from
+    different handlers run concurrently instead of blocking the event loop.
+    Search and track results are served from the cache, even stale ones, while
+    they are refreshed, and a circuit breaker fails fast while Spotify is down.
+    The cached results are also kept on disk, so a restarted bot starts warm.
     """
 
-    TOKEN_URL = "https://accounts.spotify.com/api/token"
-    SEARCH_URL = "https://api.spotify.com/v1/search"
-    TRACK_URL = "https://api.spotify.com/v1/tracks"
+    TOKEN_URL = SPOTIFY_TOKEN_URL
+    SEARCH_URL = f"{SPOTIFY_API_URL}/search"
+    TRACK_URL = f"{SPOTIFY_API_URL}/tracks"
+    TRACKS_BATCH_SIZE = 50
 
-    def __init__(self):
-        self.token = self.get_access_token()
+    def __init__(
+        self, pool_size: int = SPOTIFY_POOL_SIZE, timeout: float = SPOTIFY_TIMEOUT
+    ):
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tokens = TokenManager(self._fetch_token)
+        self._inflight = SingleFlight()
+        self.limiter = AdaptiveLimiter()
+        self.breaker = CircuitBreaker(
+            "spotify", SPOTIFY_BREAKER_FAILURES, SPOTIFY_BREAKER_RESET
+        )
+        self.previews = PreviewCache()
 
-    @cache_res(ttl=3600)
-    def get_access_token(self):
+    @property
+    def token(self) -> Optional[str]:
+        return self._tokens.token
+
+    async def _get_session(self) -> aiohttp.ClientSession:
         """
-        Fetches an OAuth access token using the Client Credentials flow.
+        Lazily creates the shared HTTP session inside the running event loop.
         """
-        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._pool_size, ttl_dns_cache=300, keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+        return self._session
+
+    async def close(self):
+        """
+        Closes the underlying HTTP session and its pooled connections.
+        """
+        self._tokens.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _fetch_token(self) -> dict:
         data = {
             "grant_type": "client_credentials",
             "client_id": SPOTIFY_CLIENT_ID,
             "client_secret": SPOTIFY_CLIENT_SECRET,
         }
-        response = requests.post(self.TOKEN_URL, headers=headers, data=data)
-        response.raise_for_status()
-        return response.json().get("access_token")
+        session = await self._get_session()
+        async with session.post(self.TOKEN_URL, data=data) as response:
+            response.raise_for_status()
+            return await response.json()
 
-    def search(self, query, search_type="track", limit=10):
+    async def warm_up(self):
+        """
+        Opens the HTTP session and fetches the first access token ahead of the
+        first request. Failures are only logged: requests fetch the token on
+        their own, so an unreachable Spotify does not stop the bot from starting.
+        """
+        try:
+            await self.get_access_token()
+        except Exception as e:
+            logging.warning(f"Не удалось заранее получить токен Spotify: {e}")
+        else:
+            logging.info("Клиент Spotify готов.")
+
+    async def get_access_token(self) -> str:
+        """
+        Fetches an OAuth access token using the Client Credentials flow.
+        The token is kept by the token manager and refreshed in the background
+        shortly before it expires.
+        """
+        return await self._tokens.get_token()
+
+    async def _get(self, url: str, params: Optional[dict] = None) -> dict:
+        """
+        Performs a GET request, sharing one upstream call between identical
+        concurrent requests (same endpoint and normalized params).
+        """
+        key = (url, tuple(sorted((k, str(v)) for k, v in (params or {}).items())))
+        return await self._inflight.do(key, lambda: self._request(url, params))
+
+    async def _request(self, url: str, params: Optional[dict] = None) -> dict:
+        """
+        Sends the request, or raises CircuitOpenError while the circuit breaker
+        is open. Server errors, timeouts and exhausted 429 retries count as
+        failures; client errors (4xx) mean Spotify itself is fine.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(
+                "Spotify сейчас недоступен, попробуйте позже.",
+                self.breaker.retry_in(),
+            )
+        try:
+            data = await self._request_within_limits(url, params)
+        except Exception as e:
+            if _is_upstream_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return data
+
+    async def _request_within_limits(
+        self, url: str, params: Optional[dict] = None
+    ) -> dict:
+        """
+        Sends the request within the adaptive limiter's window. A 429 answer is
+        reported to the limiter and the request is queued again after its
+        Retry-After instead of failing; an expired token is refreshed once.
+        """
+        loop = asyncio.get_running_loop()
+        for _ in range(SPOTIFY_MAX_RETRIES + 1):
+            async with self.limiter:
+                started = loop.time()
+                status, retry_after, data = await self._send(url, params)
+                if status != 429:
+                    self.limiter.on_success(loop.time() - started)
+                    return data
+                self.limiter.on_throttled(retry_after)
+        raise SpotifyRateLimitError(
+            "Spotify временно ограничил количество запросов, попробуйте позже."
+        )
+
+    async def _send(self, url: str, params: Optional[dict]):
+        token = await self._tokens.get_token()
+        session = await self._get_session()
+        async with session.get(
+            url, headers={"Authorization": f"Bearer {token}"}, params=params
+        ) as response:
+            if response.status == 429:
+                return 429, _retry_after(response), None
+            if response.status != 401:
+                response.raise_for_status()
+                return response.status, 0, await response.json()
+
+        token = await self._tokens.refresh(stale_token=token)
+        async with session.get(
+            url, headers={"Authorization": f"Bearer {token}"}, params=params
+        ) as response:
+            if response.status == 429:
+                return 429, _retry_after(response), None
+            response.raise_for_status()
+            return response.status, 0, await response.json()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """
+        Case-folds a search query and collapses its whitespace. Spotify search is
+        case-insensitive, so equal normalized queries return the same results.
+        """
+        return " ".join(query.casefold().split())
+
+    async def search(self, query, search_type="track", limit=10):
         """
         Searches the Spotify catalog for tracks, artists, or playlists.
         - query: The search term (e.g., track name, artist name).
         - search_type: The type of search (track, artist, playlist).
         - limit: The number of results to return (default: 10).
         """
+        return await self.search_normalized(
+            self.normalize_query(query), search_type, limit
+        )
+
+    @cache_res(ttl=600, stale_ttl=3600, persist=default_disk_cache)
+    async def search_normalized(self, query, search_type, limit):
+        """
+        Cached body of `search`. Takes an already normalized query and positional
+        arguments only, so that equivalent searches share one cache entry.
+        """
         params = {"q": query, "type": search_type, "limit": limit}
-        headers = {"Authorization": f"Bearer {self.token}"}
-        response = requests.get(self.SEARCH_URL, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        return await self._get(self.SEARCH_URL, params=params)
 
-    def get_track(self, track_id):
+    @cache_res(ttl=3600, stale_ttl=24 * 3600, persist=default_disk_cache)
+    async def get_track(self, track_id):
         """
         Fetches information about a specific track by its track_id.
         - track_id: The Spotify ID of the track.
         """
-        url = f"{self.TRACK_URL}/{track_id}"
-        headers = {"Authorization": f"Bearer {self.token}"}
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        return await self._get(f"{self.TRACK_URL}/{track_id}")
+
+    async def get_tracks(
+        self, track_ids: Iterable[str], concurrency: int = SPOTIFY_BATCH_CONCURRENCY
+    ) -> List[Optional[dict]]:
+        """
+        Fetches several tracks at once via the multi-ID `/v1/tracks?ids=` endpoint.
+        - track_ids: Spotify IDs of the tracks, duplicates are allowed.
+        - concurrency: How many 50-ID chunks may be requested at the same time.
 
-        return response.json()
+        Tracks already cached by `get_track` (in memory or on disk) are not
+        requested again, and fetched tracks are cached for it. The result follows
+        the input order; IDs that Spotify does not know, and the IDs of a chunk
+        whose request failed, are returned as None. Other chunks are not affected.
+        """
+        track_ids = list(track_ids)
+        unique_ids = list(dict.fromkeys(track_ids))
+        cached = await asyncio.gather(
+            *(
+                SpotifyAPI.get_track.cache_lookup(self, track_id)
+                for track_id in unique_ids
+            )
+        )
+        found = {}
+        to_fetch = []
+        for track_id, track in zip(unique_ids, cached):
+            if track is not None:
+                found[track_id] = track
+            else:
+                to_fetch.append(track_id)
+
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def fetch_chunk(chunk: List[str]):
+            async with semaphore:
+                payload = await self._get(
+                    self.TRACK_URL, params={"ids": ",".join(chunk)}
+                )
+            for track_id, track in zip(chunk, payload.get("tracks", [])):
+                if track is not None:
+                    found[track_id] = track
+                    SpotifyAPI.get_track.cache_set(track, self, track_id)
+
+        chunks = []
+        for start in range(0, len(to_fetch), self.TRACKS_BATCH_SIZE):
+            end = start + self.TRACKS_BATCH_SIZE
+            chunks.append(to_fetch[start:end])
+        results = await asyncio.gather(
+            *(fetch_chunk(chunk) for chunk in chunks), return_exceptions=True
+        )
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                logging.warning(
+                    f"Не удалось получить {len(chunk)} треков из Spotify: {result}"
+                )
+        return [found.get(track_id) for track_id in track_ids]
+
+    async def download_preview(self, preview_url: str) -> bytes:
+        """
+        Returns the content of a preview MP3, downloading it on first use.
+        The download is read in chunks and then stored in the on-disk cache, and
+        concurrent requests for the same URL share one download. The content is
+        returned rather than the cached file, which another worker may evict at
+        any time.
+        """
+        content = await self.previews.read(preview_url)
+        if content is not None:
+            return content
+        return await self._inflight.do(
+            ("preview", preview_url), lambda: self._download_preview(preview_url)
+        )
+
+    async def _download_preview(self, preview_url: str) -> bytes:
+        chunks = []
+        session = await self._get_session()
+        async with session.get(preview_url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                chunks.append(chunk)
+        content = b"".join(chunks)
+        await self.previews.write(preview_url, content)
+        return content
+
+    @staticmethod
+    def track_summary(track: dict) -> dict:
+        """
+        Extracts the catalog fields (id, name, artists, album) from a track object.
+        """
+        return {
+            "track_id": track.get("id"),
+            "track_name": track.get("name", "Unknown Track"),
+            "artist_name": ", ".join(
+                artist["name"] for artist in track.get("artists", [])
+            ),
+            "album_name": track.get("album", {}).get("name", "Unknown Album"),
+        }
 
     @staticmethod
     def get_audio_preview_url(response: dict) -> str:
@@ -82,18 +370,39 @@ class SpotifyAPI:
             return f"❌ Произошла ошибка: {str(e)}"
 
 
-if __name__ == "__main__":
+_shared: Optional[SpotifyAPI] = None
+
+
+def get_spotify() -> SpotifyAPI:
+    """
+    Returns the Spotify client shared by the whole process, creating it on first
+    use. Creating it does no I/O; the session and the token are set up lazily
+    (or ahead of time by `warm_up`).
+    """
+    global _shared
+    if _shared is None:
+        _shared = SpotifyAPI()
+    return _shared
+
+
+async def _demo():
     spotify = SpotifyAPI()
+    try:
+        print("Searching for tracks...")
+        track_results = await spotify.search("Imagine", search_type="track")
+        for track in track_results["tracks"]["items"]:
+            print(f"{track['name']} by {track['artists'][0]['name']}")
+
+        print("\nSearching for playlists...")
+        playlist_results = await spotify.search("Chill Vibes", search_type="playlist")
+        for playlist in playlist_results["playlists"]["items"]:
+            if playlist is not None:
+                owner = playlist.get("owner", {})
+                owner_name = owner.get("display_name", "Unknown Owner")
+                print(f"{playlist.get('name', 'Unknown Playlist')} by {owner_name}")
+    finally:
+        await spotify.close()
 
-    print("Searching for tracks...")
-    track_results = spotify.search("Imagine", search_type="track")
-    for track in track_results["tracks"]["items"]:
-        print(f"{track['name']} by {track['artists'][0]['name']}")
-
-    print("\nSearching for playlists...")
-    playlist_results = spotify.search("Chill Vibes", search_type="playlist")
-    for playlist in playlist_results["playlists"]["items"]:
-        if playlist is not None:
-            owner = playlist.get("owner", {})
-            owner_name = owner.get("display_name", "Unknown Owner")
-            print(f"{playlist.get('name', 'Unknown Playlist')} by {owner_name}")
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
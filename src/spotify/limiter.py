@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Optional
+
+from config.settings import (
+    SPOTIFY_CONCURRENCY_INITIAL,
+    SPOTIFY_CONCURRENCY_MAX,
+    SPOTIFY_LATENCY_TARGET,
+)
+
+
+class AdaptiveLimiter:
+    """
+    Client-side concurrency window for Spotify requests, adjusted AIMD-style:
+    every successful fast response widens the window by about one request per
+    window's worth of responses; a 429 or a response slower than `latency_target`
+    halves it (at most once per `cooldown` seconds). A 429 also pauses all new
+    requests until its Retry-After has passed. Callers that do not fit in the
+    window wait in FIFO order instead of failing.
+    - initial / minimum / maximum: Start value and bounds of the window.
+    - latency_target: Response time, in seconds, above which the window shrinks.
+    - decrease: Factor the window is multiplied by on congestion.
+    """
+
+    def __init__(
+        self,
+        initial: int = SPOTIFY_CONCURRENCY_INITIAL,
+        minimum: int = 1,
+        maximum: int = SPOTIFY_CONCURRENCY_MAX,
+        latency_target: float = SPOTIFY_LATENCY_TARGET,
+        decrease: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.slow = 0
+        self._last_decrease = float("-inf")
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def window(self) -> int:
+        return max(self.minimum, int(self.limit))
+
+    def _can_start(self, now: float) -> bool:
+        return now >= self.paused_until and self.in_flight < self.window
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        if not self._waiters and self._can_start(loop.time()):
+            self.in_flight += 1
+            return
+        future = loop.create_future()
+        self._waiters.append(future)
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                # `_wake` drops cancelled futures it comes across.
+                if future in self._waiters:
+                    self._waiters.remove(future)
+            else:
+                # The slot was granted just before the cancellation; hand it on.
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def _wake(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        while self._waiters and self._can_start(now):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+        if self._waiters and now < self.paused_until and self._timer is None:
+            self._timer = loop.call_at(self.paused_until, self._on_pause_end)
+
+    def _on_pause_end(self):
+        self._timer = None
+        self._wake()
+
+    def _shrink(self, now: float):
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.minimum), self.limit * self.decrease)
+        logging.info(f"Окно запросов к Spotify уменьшено до {self.window}.")
+
+    def on_success(self, latency: float):
+        """
+        Records a completed request that took `latency` seconds.
+        """
+        now = asyncio.get_running_loop().time()
+        if latency > self.latency_target:
+            self.slow += 1
+            self._shrink(now)
+        else:
+            self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_throttled(self, retry_after: float):
+        """
+        Records a 429 answer: shrinks the window and pauses new requests.
+        """
+        now = asyncio.get_running_loop().time()
+        self.throttled += 1
+        self._shrink(now)
+        self.paused_until = max(self.paused_until, now + retry_after)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._wake()
+
+    def stats(self) -> dict:
+        now = asyncio.get_running_loop().time()
+        return {
+            "window": self.window,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "throttled": self.throttled,
+            "slow": self.slow,
+            "paused_for": max(0.0, self.paused_until - now),
+        }
@@ -0,0 +1,173 @@
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from config.settings import PREVIEW_CACHE_DIR, PREVIEW_CACHE_MAX_BYTES
+
+# Partial downloads untouched for this long are leftovers of a crashed process.
+_STALE_PART_AGE = 3600
+
+
+class PreviewCache:
+    """
+    Content-addressed on-disk cache of preview MP3s, named by the SHA-256 of
+    their URL, with a total size budget and least-recently-used eviction.
+    The files on disk are the index: recency is kept in their modification
+    times. Their total size and count are kept in a small state file updated
+    under an exclusive file lock, so several worker processes share one
+    directory and one budget; the directory is only scanned on first use and
+    when a write exceeds the budget. All file I/O runs in a thread.
+    - directory: Where the files are stored, created on first use.
+    - max_bytes: Size budget for all cached files together.
+    - low_water: Share of the budget eviction frees the cache down to, so that
+      the next scans are many writes away.
+    """
+
+    SUFFIX = ".mp3"
+    LOCK_NAME = ".lock"
+    STATE_NAME = ".state"
+
+    def __init__(
+        self,
+        directory: str = PREVIEW_CACHE_DIR,
+        max_bytes: int = PREVIEW_CACHE_MAX_BYTES,
+        low_water: float = 0.9,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._entries = 0
+        self._size = 0
+        self._loaded = False
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(self.directory / self.LOCK_NAME, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_state(self) -> Optional[Tuple[int, int]]:
+        try:
+            size, entries = (self.directory / self.STATE_NAME).read_text().split()
+            return int(size), int(entries)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_state(self, size: int, entries: int):
+        (self.directory / self.STATE_NAME).write_text(f"{size} {entries}")
+        self._size = size
+        self._entries = entries
+
+    def _load(self):
+        if self._loaded:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Other processes may be writing their own .part files right now.
+        expired = time.time() - _STALE_PART_AGE
+        for leftover in self.directory.glob("*.part"):
+            try:
+                if leftover.stat().st_mtime < expired:
+                    leftover.unlink()
+            except FileNotFoundError:
+                pass
+        with self._locked():
+            # Recount once per process, in case files were removed by hand.
+            self._write_state(*self._evict())
+        self._loaded = True
+
+    async def read(self, url: str) -> Optional[bytes]:
+        """
+        Returns the cached content for `url`, or None if it is not cached.
+        """
+        return await asyncio.to_thread(self._read, url)
+
+    def _read(self, url: str) -> Optional[bytes]:
+        self._load()
+        try:
+            with open(self._path(self.key(url)), "rb") as file:
+                # An open file stays readable even if another process evicts it.
+                os.utime(file.fileno())
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    async def write(self, url: str, content: bytes):
+        """
+        Stores the content of `url`, replacing the cached file atomically, and
+        evicts the least recently used files if the budget is exceeded.
+        """
+        await asyncio.to_thread(self._write, url, content)
+
+    def _write(self, url: str, content: bytes):
+        self._load()
+        path = self._path(self.key(url))
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(content)
+            with self._locked():
+                state = self._read_state()
+                try:
+                    replaced: Optional[int] = path.stat().st_size
+                except FileNotFoundError:
+                    replaced = None
+                os.replace(tmp, path)
+                if state is None or state[0] + len(content) > self.max_bytes:
+                    state = self._evict()
+                elif replaced is None:
+                    state = (state[0] + len(content), state[1] + 1)
+                else:
+                    state = (state[0] + len(content) - replaced, state[1])
+                self._write_state(*state)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _scan(self) -> List[Tuple[float, int, Path]]:
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(self.SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+        return sorted(files)
+
+    def _evict(self) -> Tuple[int, int]:
+        """
+        Recounts the directory and, if it exceeds the budget, removes the least
+        recently used files down to `low_water` of it. Runs under the lock and
+        returns the new total size and number of files.
+        """
+        files = self._scan()
+        size = sum(file_size for _, file_size, _ in files)
+        if size > self.max_bytes:
+            # The newest file is kept even if it alone exceeds the budget.
+            while size > self.max_bytes * self.low_water and len(files) > 1:
+                _, file_size, path = files.pop(0)
+                path.unlink(missing_ok=True)
+                size -= file_size
+                logging.info(f"Превью {path.stem} удалено из кэша.")
+        return size, len(files)
+
+    def stats(self) -> dict:
+        return {"entries": self._entries, "bytes": self._size}
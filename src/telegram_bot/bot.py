@@ -1,52 +1,173 @@
 import logging
 import asyncio
 from aiogram import Bot, Dispatcher
-from config.settings import TELEGRAM_BOT_TOKEN, DATABASE_URL
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from config.settings import (
+    BOT_MODE,
+    BOT_WORKERS,
+    TELEGRAM_API_URL,
+    TELEGRAM_BOT_TOKEN,
+    DATABASE_URL,
+)
 from src.telegram_bot.database import Database
+from src.spotify.client import get_spotify
 from src.telegram_bot.main_handlers import register_main_handlers
 from src.telegram_bot.playback_handlers import register_playback_handlers
+from src.telegram_bot.inline_handlers import register_inline_handlers
 from src.telegram_bot.playlist_handlers import register_playlist_handlers
+from src.telegram_bot.executor import UserExecutor
+from src.telegram_bot.sender import SendScheduler, SharedChatLimits
+from src.telegram_bot.supervisor import run_supervisor, serve_queue
+from src.telegram_bot.webhook import run_webhook
+from src.utils.cache import default_cache
+from src.utils.disk_cache import default_disk_cache
 from aiogram.dispatcher.middlewares.base import BaseMiddleware
 from aiogram.types.base import TelegramObject
 
 logging.basicConfig(level=logging.INFO)
 
 try:
-    bot = Bot(token=TELEGRAM_BOT_TOKEN)
+    bot = Bot(
+        token=TELEGRAM_BOT_TOKEN,
+        session=(
+            AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+            if TELEGRAM_API_URL
+            else None
+        ),
+    )
 except ValueError as e:
     logging.error(f"Ошибка в токене Telegram: {e}")
     exit(1)
 
+send_scheduler = SendScheduler()
+bot.session.middleware(send_scheduler)
+
+executor = UserExecutor()
+
+_background_tasks: set = set()
+
 dp = Dispatcher()
 
 
 class DbMiddleware(BaseMiddleware):
+    """
+    Passes the database and the in-memory set of registered telegram ids
+    (filled on /start and on successful checks) to the handlers.
+    """
+
     def __init__(self, db_pool):
         super().__init__()
         self.db_pool = db_pool
+        self.known_users: set = set()
 
     async def __call__(self, handler, event: TelegramObject, data: dict):
         data["db_pool"] = self.db_pool
+        data["known_users"] = self.known_users
         return await handler(event, data)
 
 
-async def main():
+def register_handlers(dp: Dispatcher):
+    register_main_handlers(dp)
+    register_playlist_handlers(dp)
+    register_playback_handlers(dp)
+    register_inline_handlers(dp)
+
+
+async def serve(bot: Bot, dp: Dispatcher):
     """
-    Entrypoint to the bot app.
+    Receives updates from Telegram by webhook or long polling, see BOT_MODE.
     """
+    logging.info(f"Бот запущен! Режим: {BOT_MODE}")
+    if BOT_MODE == "webhook":
+        await run_webhook(bot, dp)
+    else:
+        # getUpdates is refused while a webhook is registered.
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
+
+
+async def _open_resources() -> Database:
+    if not DATABASE_URL:
+        raise RuntimeError("Не задана переменная окружения DATABASE_URL.")
     db = Database(DATABASE_URL)
     await db.connect()
+    dp.update.outer_middleware(executor)
     dp.update.middleware(DbMiddleware(db))
-    register_main_handlers(dp)
-    register_playlist_handlers(dp)
-    register_playback_handlers(dp)
+    default_cache.start_sweeper()
+    return db
 
+
+async def warm_up_spotify():
+    """
+    Prepares the Spotify client in the background, so that the bot starts
+    receiving updates without waiting for Spotify (or without it at all).
+    """
+    task = asyncio.create_task(get_spotify().warm_up())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _close_resources(db: Database):
+    await default_cache.stop_sweeper()
+    await db.close()
+    spotify = get_spotify()
+    logging.info(f"Состояние лимитера Spotify: {spotify.limiter.stats()}")
+    logging.info(f"Предохранитель Spotify: {spotify.breaker.stats()}")
+    await spotify.close()
+    await default_disk_cache.close()
+    logging.info(f"Статистика дискового кэша: {default_disk_cache.stats()}")
+    logging.info(f"Статистика обработки обновлений: {executor.stats()}")
+    logging.info(f"Статистика очереди отправки: {send_scheduler.stats()}")
+    await send_scheduler.close()
+    await bot.session.close()
+
+
+async def run_worker(index: int, workers: int, queue, group_limits=None):
+    """
+    Entrypoint of a worker process in multi-process mode (BOT_WORKERS > 1).
+    Handles the updates routed to it by the supervisor. Every worker has its own
+    database connections, caches and Spotify token; writes from all workers are
+    serialized by SQLite itself (WAL plus busy_timeout), and the preview cache
+    directory is shared under a file lock. Updates are sharded by user, so a
+    private chat's send limit is enforced by the one worker that replies to it;
+    group limits are kept in `group_limits`, shared by all workers, and the
+    global Telegram send rate is split evenly between the workers.
+    """
+    send_scheduler.global_rate /= workers
+    if group_limits is not None:
+        send_scheduler.shared_groups = SharedChatLimits(
+            group_limits, send_scheduler.group_rate, send_scheduler.chat_burst
+        )
+    register_handlers(dp)
+    db = await _open_resources()
+    await warm_up_spotify()
+    logging.info(f"Воркер {index} из {workers} готов.")
     try:
-        logging.info("Бот запущен!")
-        await dp.start_polling(bot)
+        await serve_queue(bot, dp, queue)
+    finally:
+        await _close_resources(db)
+
+
+async def main():
+    """
+    Entrypoint to the bot app.
+    """
+    register_handlers(dp)
+    if BOT_WORKERS > 1:
+        try:
+            await run_supervisor(bot, dp, BOT_WORKERS, serve)
+        finally:
+            await bot.session.close()
+        return
+
+    db = await _open_resources()
+    # Runs once polling or the webhook server has started.
+    dp.startup.register(warm_up_spotify)
+    try:
+        await serve(bot, dp)
     finally:
-        await db.close()
-        await bot.session.close()
+        await _close_resources(db)
 
 
 if __name__ == "__main__":
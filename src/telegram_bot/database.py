@@ -1,77 +1,497 @@
+import asyncio
 import aiosqlite
 import logging
+from contextlib import asynccontextmanager
+from config.settings import (
+    DB_BUSY_TIMEOUT_MS,
+    DB_CACHE_SIZE_KIB,
+    DB_COMMIT_BATCH_SIZE,
+    DB_COMMIT_INTERVAL,
+    DB_GROUP_COMMIT,
+    DB_MMAP_SIZE,
+    DB_READERS,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_TRANSACTION_TIMEOUT,
+)
 from src.telegram_bot.sql_scripts import (
     CREATE_USERS_TABLE,
+    CREATE_TRACKS_TABLE,
     CREATE_LIKED_TRACKS_TABLE,
     CREATE_PLAYLISTS_TABLE,
     CREATE_PLAYLIST_TRACKS_TABLE,
+    CREATE_PREVIEW_FILES_TABLE,
+    CREATE_LIBRARY_TABLE,
+    CREATE_LIBRARY_FTS_TABLE,
+    CREATE_INDEXES,
+    BACKFILL_LIBRARY,
+    UPGRADE_LIKED_TRACKS,
+    UPGRADE_PLAYLIST_TRACKS,
 )
+from pathlib import Path
 from urllib.parse import urlparse
-from typing import Optional
+from typing import Any, AsyncIterator, List, NamedTuple, Optional, Union
+
+
+class _Write(NamedTuple):
+    query: str
+    params: Any
+    many: bool
+    returning: bool
+    future: asyncio.Future
+
+
+class _Unit(NamedTuple):
+    """
+    A multi-statement transaction queued for group commit: the writer resolves
+    `started` with a Transaction when the unit's turn comes, the caller resolves
+    `finished` with None or the exception that ended its block, and `future` is
+    resolved once the batch containing the unit has been committed.
+    """
+
+    started: asyncio.Future
+    finished: asyncio.Future
+    future: asyncio.Future
+
+
+async def _run_statement(
+    connection: aiosqlite.Connection,
+    query: str,
+    params: Any,
+    many: bool = False,
+    returning: bool = False,
+):
+    """
+    Runs one write statement and returns its RETURNING rows or affected-row count.
+    """
+    if many:
+        cursor = await connection.executemany(query, params)
+    else:
+        cursor = await connection.execute(query, params)
+    try:
+        if returning:
+            return await cursor.fetchall()
+        return cursor.rowcount
+    finally:
+        await cursor.close()
+
+
+class Transaction:
+    """
+    A multi-statement transaction on the writer connection, see `Database.transaction`.
+    """
+
+    def __init__(self, connection: aiosqlite.Connection):
+        self.connection = connection
+        self.expired = False
+
+    def _check(self):
+        # Once the writer has given up on the transaction, its statements
+        # would run in whatever the writer does next.
+        if self.expired:
+            raise RuntimeError("Транзакция отменена по тайм-ауту.")
+
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        self._check()
+        logging.info(f"Executing query in transaction: {query} with params: {params}")
+        return await _run_statement(self.connection, query, params)
+
+    async def executemany(self, query: str, params_seq: list) -> int:
+        self._check()
+        logging.info(
+            f"Executing query in transaction: {query} for {len(params_seq)} rows"
+        )
+        return await _run_statement(self.connection, query, params_seq, many=True)
+
+    async def execute_returning(self, query: str, params: tuple = ()) -> list:
+        self._check()
+        logging.info(f"Executing query in transaction: {query} with params: {params}")
+        return await _run_statement(self.connection, query, params, returning=True)
+
+    async def fetchone(self, query: str, params: tuple = ()):
+        self._check()
+        async with self.connection.execute(query, params) as cursor:
+            return await cursor.fetchone()
+
+    async def fetchall(self, query: str, params: tuple = ()):
+        self._check()
+        async with self.connection.execute(query, params) as cursor:
+            return await cursor.fetchall()
 
 
 class Database:
-    def __init__(self, db_path: str):
+    """
+    SQLite access in WAL mode: one dedicated writer connection plus a pool of
+    read-only connections, so reads run concurrently with writes.
+    - db_path: Database URL (e.g. sqlite:///bot.db).
+    - readers: Size of the read-only connection pool; 0 sends reads to the writer.
+    - group_commit: Queue writes from concurrent callers and commit them together,
+      one transaction per `commit_batch_size` statements or `commit_interval` seconds.
+      Each caller is resumed only after its batch has been committed.
+      Transactions are queued as well and committed as part of a batch.
+    - transaction_timeout: With group commit, how long a transaction's block may
+      hold the writer; after that it is rolled back and fails with TimeoutError,
+      so one stuck caller cannot stall every queued write.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        readers: int = DB_READERS,
+        group_commit: bool = DB_GROUP_COMMIT,
+        commit_batch_size: int = DB_COMMIT_BATCH_SIZE,
+        commit_interval: float = DB_COMMIT_INTERVAL,
+        transaction_timeout: float = DB_TRANSACTION_TIMEOUT,
+    ):
         self.db_path = db_path
+        self.readers = readers
+        self.group_commit = group_commit
+        self.commit_batch_size = commit_batch_size
+        self.commit_interval = commit_interval
+        self.transaction_timeout = transaction_timeout
         self.connection: Optional[aiosqlite.Connection] = None
+        self._reader_connections: List[aiosqlite.Connection] = []
+        self._reader_pool: Optional[asyncio.Queue] = None
+        self._write_lock = asyncio.Lock()
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
 
     async def connect(self):
         try:
             parsed_url = urlparse(self.db_path)
             self.db_path = parsed_url.path
-            self.connection = await aiosqlite.connect(self.db_path)
+            self.connection = await aiosqlite.connect(
+                self.db_path, cached_statements=DB_STATEMENT_CACHE_SIZE
+            )
+            await self._apply_pragmas(self.connection)
+            await self.connection.execute("PRAGMA journal_mode = WAL;")
             logging.info("Подключение к базе данных установлено.")
             await self._create_tables()
+            await self._open_readers()
+            if self.group_commit:
+                # Each batch pays for one fsync, so full durability stays cheap.
+                await self.connection.execute("PRAGMA synchronous = FULL;")
+                self._write_queue = asyncio.Queue()
+                self._writer_task = asyncio.create_task(self._run_writer())
         except Exception as e:
             logging.error(f"Ошибка подключения к базе данных: {e}")
+            await self.close()
             raise
 
+    @staticmethod
+    async def _apply_pragmas(connection: aiosqlite.Connection):
+        await connection.execute("PRAGMA synchronous = NORMAL;")
+        await connection.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KIB};")
+        await connection.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE};")
+        await connection.execute("PRAGMA temp_store = MEMORY;")
+        await connection.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS};")
+
+    async def _open_readers(self):
+        if self.readers <= 0 or self.db_path in ("", ":memory:"):
+            return
+        self._reader_pool = asyncio.Queue()
+        for _ in range(self.readers):
+            reader = await aiosqlite.connect(
+                f"{Path(self.db_path).resolve().as_uri()}?mode=ro",
+                uri=True,
+                cached_statements=DB_STATEMENT_CACHE_SIZE,
+            )
+            await self._apply_pragmas(reader)
+            await reader.execute("PRAGMA query_only = ON;")
+            self._reader_connections.append(reader)
+            self._reader_pool.put_nowait(reader)
+        logging.info(f"Открыто {self.readers} соединений для чтения.")
+
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        if not self.connection:
+            raise RuntimeError("Соединение с базой данных не установлено.")
+        if self._reader_pool is None:
+            yield self.connection
+            return
+        reader = await self._reader_pool.get()
+        try:
+            yield reader
+        finally:
+            self._reader_pool.put_nowait(reader)
+
     async def _create_tables(self):
         if not self.connection:
             raise RuntimeError("Соединение с базой данных не установлено.")
         async with self.connection.cursor() as cursor:
             await cursor.execute(CREATE_USERS_TABLE)
+            await cursor.execute(CREATE_TRACKS_TABLE)
+            await self._upgrade_tables(self.connection)
             await cursor.execute(CREATE_LIKED_TRACKS_TABLE)
             await cursor.execute(CREATE_PLAYLISTS_TABLE)
             await cursor.execute(CREATE_PLAYLIST_TRACKS_TABLE)
+            await cursor.execute(CREATE_PREVIEW_FILES_TABLE)
+            await cursor.execute(CREATE_LIBRARY_TABLE)
+            await cursor.execute(CREATE_LIBRARY_FTS_TABLE)
+            for create_index in CREATE_INDEXES:
+                await cursor.execute(create_index)
+            await cursor.execute("SELECT 1 FROM library LIMIT 1;")
+            if await cursor.fetchone() is None:
+                for statement in BACKFILL_LIBRARY:
+                    await cursor.execute(statement)
             await self.connection.commit()
             logging.info("Таблицы в базе данных проверены и созданы.")
 
+    @staticmethod
+    async def _upgrade_tables(connection: aiosqlite.Connection):
+        """
+        Brings liked_tracks and playlist_tracks created before the tracks catalog
+        to the current schema, so that an existing database works without running
+        the alembic migrations by hand.
+        """
+        upgrades: List[str] = []
+        columns = await connection.execute_fetchall(
+            "SELECT name FROM pragma_table_info('liked_tracks');"
+        )
+        if "track_name" in {row[0] for row in columns}:
+            upgrades.extend(UPGRADE_LIKED_TRACKS)
+        columns = await connection.execute_fetchall(
+            "SELECT name FROM pragma_table_info('playlist_tracks');"
+        )
+        references = await connection.execute_fetchall(
+            "SELECT 1 FROM pragma_foreign_key_list('playlist_tracks') "
+            "WHERE \"table\" = 'tracks';"
+        )
+        if columns and not references:
+            upgrades.extend(UPGRADE_PLAYLIST_TRACKS)
+        if not upgrades:
+            return
+        await connection.execute("BEGIN;")
+        try:
+            for statement in upgrades:
+                await connection.execute(statement)
+        except Exception:
+            await connection.rollback()
+            raise
+        await connection.commit()
+        logging.info(
+            "Таблицы liked_tracks и playlist_tracks перенесены на каталог треков."
+        )
+
     async def close(self):
+        if self._writer_task is not None and self._write_queue is not None:
+            self._write_queue.put_nowait(None)
+            await self._writer_task
+            self._writer_task = None
+            self._write_queue = None
+        for reader in self._reader_connections:
+            await reader.close()
+        self._reader_connections.clear()
+        self._reader_pool = None
         if self.connection:
             await self.connection.close()
             logging.info("Соединение с базой данных закрыто.")
 
-    async def execute(self, query: str, params: tuple = ()):
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        """
+        Runs a write statement and returns the number of affected rows.
+        """
+        logging.info(f"Executing query: {query} with params: {params}")
+        return await self._write(query, params)
+
+    async def executemany(self, query: str, params_seq: list) -> int:
+        logging.info(f"Executing query: {query} for {len(params_seq)} rows")
+        return await self._write(query, params_seq, many=True)
+
+    async def execute_returning(self, query: str, params: tuple = ()) -> list:
+        """
+        Runs a write statement with a RETURNING clause and returns its rows.
+        """
+        logging.info(f"Executing query: {query} with params: {params}")
+        return await self._write(query, params, returning=True)
+
+    async def _write(
+        self, query: str, params: Any, many: bool = False, returning: bool = False
+    ):
         if not self.connection:
             raise RuntimeError("Соединение с базой данных не установлено.")
-        logging.info(f"Executing query: {query} with params: {params}")
-        async with self.connection.cursor() as cursor:
-            await cursor.execute(query, params)
-            await self.connection.commit()
+        if self._write_queue is not None:
+            future = asyncio.get_running_loop().create_future()
+            self._write_queue.put_nowait(_Write(query, params, many, returning, future))
+            return await future
+        async with self._write_lock:
+            try:
+                result = await _run_statement(
+                    self.connection, query, params, many, returning
+                )
+                await self.connection.commit()
+            except Exception:
+                await self.connection.rollback()
+                raise
+        return result
 
-    async def fetchone(self, query: str, params: tuple = ()):
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Transaction]:
+        """
+        Runs several statements atomically on the writer connection.
+        Commits when the block exits normally and rolls back on an exception.
+        With group commit the transaction waits for its turn in the write queue,
+        runs inside a savepoint of the current batch and is committed with it.
+        """
         if not self.connection:
             raise RuntimeError("Соединение с базой данных не установлено.")
+        if self._write_queue is not None:
+            loop = asyncio.get_running_loop()
+            unit = _Unit(
+                loop.create_future(), loop.create_future(), loop.create_future()
+            )
+            self._write_queue.put_nowait(unit)
+            try:
+                tx = await unit.started
+            except asyncio.CancelledError as e:
+                if unit.started.done() and not unit.started.cancelled():
+                    # Cancelled just as the turn came: release the writer.
+                    unit.finished.set_result(e)
+                raise
+            try:
+                yield tx
+            except BaseException as e:
+                unit.finished.set_result(e)
+                raise
+            unit.finished.set_result(None)
+            if tx.expired:
+                raise asyncio.TimeoutError("Транзакция отменена по тайм-ауту.")
+            await unit.future
+            return
+        async with self._write_lock:
+            await self.connection.execute("BEGIN;")
+            try:
+                yield Transaction(self.connection)
+            except BaseException:
+                await self.connection.rollback()
+                raise
+            await self.connection.commit()
+
+    async def _run_writer(self):
+        """
+        Collects queued writes into batches and commits each batch at once.
+        Stops after committing everything queued before `close`.
+        """
+        queue = self._write_queue
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch: List[Union[_Write, _Unit]] = []
+            item = await queue.get()
+            deadline = loop.time() + self.commit_interval
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.commit_batch_size:
+                    break
+                if not queue.empty():
+                    item = queue.get_nowait()
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                stopping = True
+            if batch:
+                await self._commit_batch(batch)
+
+        leftover = []
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not None:
+                leftover.append(item)
+        if leftover:
+            await self._commit_batch(leftover)
+
+    async def _run_unit(self, connection: aiosqlite.Connection, unit: _Unit):
+        """
+        Hands the writer connection to a queued transaction and waits until its
+        block is done. Its statements are undone alone if the block fails or
+        does not finish within `transaction_timeout`.
+        """
+        if unit.started.done():
+            # The caller was cancelled before the unit's turn came.
+            unit.future.cancel()
+            return None
+        await connection.execute("SAVEPOINT unit;")
+        tx = Transaction(connection)
+        unit.started.set_result(tx)
+        try:
+            error = await asyncio.wait_for(
+                asyncio.shield(unit.finished), self.transaction_timeout
+            )
+        except asyncio.TimeoutError as e:
+            # The caller sees `expired` when its block ends and raises TimeoutError.
+            tx.expired = True
+            logging.error(
+                f"Транзакция не завершилась за {self.transaction_timeout} с, откат."
+            )
+            error = e
+        if error is not None:
+            await connection.execute("ROLLBACK TO unit;")
+            unit.future.cancel()
+        await connection.execute("RELEASE unit;")
+        return None
+
+    async def _commit_batch(self, batch: List[Union[_Write, _Unit]]):
+        connection = self.connection
+        if connection is None:
+            closed = RuntimeError("Соединение с базой данных не установлено.")
+            for write in batch:
+                # A queued transaction is still waiting for its turn.
+                waiter = write.started if isinstance(write, _Unit) else write.future
+                if not waiter.done():
+                    waiter.set_exception(closed)
+            return
+        results: List[Any] = []
+        errors: List[Optional[BaseException]] = []
+        async with self._write_lock:
+            # An explicit BEGIN keeps the savepoints of queued transactions
+            # nested in the batch instead of committing on their own.
+            await connection.execute("BEGIN;")
+            for write in batch:
+                try:
+                    if isinstance(write, _Unit):
+                        results.append(await self._run_unit(connection, write))
+                    else:
+                        results.append(
+                            await _run_statement(
+                                connection,
+                                write.query,
+                                write.params,
+                                write.many,
+                                write.returning,
+                            )
+                        )
+                    errors.append(None)
+                except Exception as e:
+                    results.append(None)
+                    errors.append(e)
+            try:
+                await connection.commit()
+            except Exception as e:
+                logging.error(f"Ошибка фиксации пакета записей: {e}")
+                await connection.rollback()
+                errors = [e] * len(batch)
+        logging.info(f"Зафиксирован пакет из {len(batch)} записей.")
+        for write, result, error in zip(batch, results, errors):
+            if write.future.done():
+                continue
+            if error is None:
+                write.future.set_result(result)
+            else:
+                write.future.set_exception(error)
+
+    async def fetchone(self, query: str, params: tuple = ()):
         logging.info(f"Fetching one row with query: {query} and params: {params}")
-        async with self.connection.cursor() as cursor:
-            await cursor.execute(query, params)
-            return await cursor.fetchone()
+        async with self._reader() as connection:
+            async with connection.execute(query, params) as cursor:
+                return await cursor.fetchone()
 
     async def fetchall(self, query: str, params: tuple = ()):
-        if not self.connection:
-            raise RuntimeError("Соединение с базой данных не установлено.")
         logging.info(f"Fetching all rows with query: {query} and params: {params}")
-        async with self.connection.cursor() as cursor:
-            await cursor.execute(query, params)
-            return await cursor.fetchall()
-
-    async def log_all_users(self):
-        if not self.connection:
-            raise RuntimeError("Соединение с базой данных не установлено.")
-        query = "SELECT * FROM users;"
-        logging.info("Fetching all users from the database...")
-        async with self.connection.cursor() as cursor:
-            await cursor.execute(query)
-            rows = await cursor.fetchall()
-            logging.info(f"All users in the database: {rows}")
+        async with self._reader() as connection:
+            async with connection.execute(query, params) as cursor:
+                return await cursor.fetchall()
@@ -0,0 +1,133 @@
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from config.settings import EXECUTOR_CONCURRENCY
+from src.telegram_bot.supervisor import user_key
+
+
+def superseding_kind(update: Update) -> Optional[str]:
+    """
+    Returns the kind of work that a newer update of the same kind from the same
+    user makes pointless, or None. Only /search qualifies: the user only cares
+    about the results of the last query.
+    """
+    message = update.message
+    if message is not None and message.text and message.text.startswith("/search"):
+        return "search"
+    return None
+
+
+def is_unordered(update: Update) -> bool:
+    """
+    Returns True for updates that need no ordering against the user's other
+    updates. Inline queries qualify: they change nothing, and the inline
+    handler debounces them per user itself, which only works if a keystroke
+    can reach it while the previous one is still being handled.
+    """
+    return update.inline_query is not None
+
+
+class _Job:
+    __slots__ = ("kind", "turn", "task", "enqueued", "superseded")
+
+    def __init__(self, kind: Optional[str], loop: asyncio.AbstractEventLoop):
+        self.kind = kind
+        self.turn = loop.create_future()
+        self.task = asyncio.current_task()
+        self.enqueued = loop.time()
+        self.superseded = False
+
+
+class UserExecutor(BaseMiddleware):
+    """
+    Outer update middleware that runs the updates of one user strictly one after
+    another in arrival order, while updates of different users run concurrently,
+    at most `concurrency` at a time. When a user sends a newer update of a
+    superseding kind (see `superseding_kind`), the older one is dropped if it is
+    still queued and cancelled if it is already running. Updates for which
+    `unordered` returns True bypass the per-user queues and the slots.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = EXECUTOR_CONCURRENCY,
+        supersedes: Callable[[Update], Optional[str]] = superseding_kind,
+        unordered: Callable[[Update], bool] = is_unordered,
+        window: int = 1000,
+    ):
+        super().__init__()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._queues: Dict[int, Deque[_Job]] = {}
+        self.supersedes = supersedes
+        self.unordered = unordered
+        self.running = 0
+        self.completed = 0
+        self.superseded = 0
+        self._waits: Deque[float] = deque(maxlen=window)
+
+    async def __call__(self, handler, event: TelegramObject, data: dict):
+        if not isinstance(event, Update) or self.unordered(event):
+            return await handler(event, data)
+        loop = asyncio.get_running_loop()
+        key = user_key(event)
+        job = _Job(self.supersedes(event), loop)
+        queue = self._queues.setdefault(key, deque())
+        if job.kind is not None:
+            for older in queue:
+                # A job can only be dropped through its task.
+                if (
+                    older.kind == job.kind
+                    and not older.superseded
+                    and older.task is not None
+                ):
+                    older.superseded = True
+                    self.superseded += 1
+                    older.task.cancel()
+        queue.append(job)
+        if queue[0] is job:
+            job.turn.set_result(None)
+
+        try:
+            await job.turn
+            async with self._slots:
+                self._waits.append(loop.time() - job.enqueued)
+                self.running += 1
+                try:
+                    return await handler(event, data)
+                finally:
+                    self.running -= 1
+                    self.completed += 1
+        except asyncio.CancelledError:
+            if not job.superseded:
+                raise
+            if job.task is not None and hasattr(job.task, "uncancel"):
+                job.task.uncancel()
+            return None
+        finally:
+            queue.remove(job)
+            if queue:
+                if not queue[0].turn.done():
+                    queue[0].turn.set_result(None)
+            elif self._queues.get(key) is queue:
+                del self._queues[key]
+
+    def stats(self) -> dict:
+        """
+        Returns the number of queued and running updates, the deepest per-user
+        queue, counters, and the time updates waited before their handler started
+        (in seconds, over the last 1000 updates).
+        """
+        waits = sorted(self._waits)
+        queued = sum(len(queue) for queue in self._queues.values()) - self.running
+        return {
+            "queued": queued,
+            "running": self.running,
+            "max_user_depth": max(map(len, self._queues.values()), default=0),
+            "completed": self.completed,
+            "superseded": self.superseded,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "wait_max": waits[-1] if waits else 0.0,
+        }
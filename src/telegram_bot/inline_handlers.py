@@ -0,0 +1,129 @@
+from html import escape
+from typing import List, Optional
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+)
+from config.settings import (
+    INLINE_CACHE_TIME,
+    INLINE_DEBOUNCE,
+    INLINE_MIN_QUERY,
+    INLINE_PREFIX_MIN_HITS,
+    INLINE_RESULTS,
+)
+from src.spotify.client import SpotifyAPI, get_spotify
+from src.utils.debounce import Debouncer
+
+debouncer = Debouncer(INLINE_DEBOUNCE)
+
+
+def _cached_items(query: str) -> Optional[list]:
+    result = SpotifyAPI.search_normalized.cache_get(
+        get_spotify(), query, "track", INLINE_RESULTS
+    )
+    if result is None:
+        return None
+    return result.get("tracks", {}).get("items", [])
+
+
+def _matches(item: dict, words: List[str]) -> bool:
+    haystack = SpotifyAPI.normalize_query(
+        " ".join(
+            [item.get("name", ""), item.get("album", {}).get("name", "")]
+            + [artist["name"] for artist in item.get("artists", [])]
+        )
+    ).split()
+    return all(any(w.startswith(word) for w in haystack) for word in words)
+
+
+def _items_from_prefix(query: str) -> Optional[list]:
+    """
+    Answers a query from the cached results of a shorter query the user typed
+    before it, by filtering them locally. Returns None if no prefix is cached or
+    too few of its results still match.
+    """
+    words = query.split()
+    for end in range(len(query) - 1, INLINE_MIN_QUERY - 1, -1):
+        items = _cached_items(query[:end].rstrip())
+        if items is None:
+            continue
+        matching = [item for item in items if _matches(item, words)]
+        complete = len(items) < INLINE_RESULTS
+        if complete or len(matching) >= INLINE_PREFIX_MIN_HITS:
+            return matching
+        return None
+    return None
+
+
+async def _search(query: str) -> list:
+    results = await get_spotify().search(query, "track", INLINE_RESULTS)
+    return results.get("tracks", {}).get("items", [])
+
+
+def _article(item: dict) -> InlineQueryResultArticle:
+    track = SpotifyAPI.track_summary(item)
+    url = item.get("external_urls", {}).get("spotify", "")
+    images = item.get("album", {}).get("images", [])
+    return InlineQueryResultArticle(
+        id=track["track_id"],
+        title=track["track_name"],
+        description=f"{track['artist_name']} — {track['album_name']}",
+        thumbnail_url=images[-1]["url"] if images else None,
+        input_message_content=InputTextMessageContent(
+            message_text=(
+                f"🎵 <b>{escape(track['track_name'])}</b>\n"
+                f"Исполнитель(и): {escape(track['artist_name'])}\n"
+                f"Альбом: {escape(track['album_name'])}\n{url}"
+            ),
+            parse_mode="HTML",
+        ),
+        reply_markup=InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(
+                        text="❤️ Лайк", callback_data=f"like:{track['track_id']}"
+                    )
+                ]
+            ]
+        ),
+    )
+
+
+async def inline_search_handler(inline_query: InlineQuery):
+    """
+    Handler for inline queries (@bot query). Searches tracks in Spotify.
+    Exact and prefix matches are answered from the cache right away; other
+    queries are debounced per user, so only the last keystroke reaches Spotify.
+    """
+    query = SpotifyAPI.normalize_query(inline_query.query)
+    if len(query) < INLINE_MIN_QUERY:
+        await inline_query.answer([], cache_time=INLINE_CACHE_TIME)
+        return
+
+    user_id = inline_query.from_user.id
+    items = _cached_items(query)
+    if items is None:
+        items = _items_from_prefix(query)
+    if items is not None:
+        debouncer.cancel(user_id)
+    else:
+        try:
+            items = await debouncer.run(user_id, lambda: _search(query))
+        except Exception:
+            await inline_query.answer([], cache_time=0)
+            return
+        if items is None:
+            # A newer query from the same user has taken over.
+            return
+
+    await inline_query.answer(
+        [_article(item) for item in items if item.get("id")],
+        cache_time=INLINE_CACHE_TIME,
+    )
+
+
+def register_inline_handlers(dp):
+    dp.inline_query.register(inline_search_handler)
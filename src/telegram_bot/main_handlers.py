@@ -1,3 +1,5 @@
+import logging
+from html import escape
 from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, InlineKeyboardButton, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardMarkup
@@ -5,22 +7,25 @@ from src.telegram_bot.models import (
     save_user,
     is_user_authenticated,
     save_liked_track,
-    get_liked_tracks,
+    get_liked_tracks_page,
+    search_library,
 )
-from src.spotify.client import SpotifyAPI
+from src.telegram_bot.sender import bulk
+from src.spotify.client import SpotifyAPI, SpotifyUnavailableError, get_spotify
+from src.utils.circuit import CircuitOpenError
 
-spotify = SpotifyAPI()
+LIKES_PAGE_SIZE = 10
+FIND_RESULTS = 10
 
 
-async def start_command_handler(message: Message, db_pool):
+async def start_command_handler(message: Message, db_pool, known_users: set):
     """
     Handler for /start command.
     """
     telegram_id = message.from_user.id
     username = message.from_user.username
 
-    await save_user(db_pool, telegram_id, username)
-    await db_pool.log_all_users()
+    await save_user(db_pool, telegram_id, username, known_users)
     welcome_text = (
         f"👋 Привет, {message.from_user.first_name}!\n\n"
         "Вот что я умею:\n"
@@ -42,24 +47,25 @@ async def help_command_handler(message: Message):
         "- /auth: Проверка регистрации\n"
         "- /search тип запрос: Поиск трека, артиста или альбома (например, /search track Imagine Dragons)\n"
         "- /likes: Показать ваши лайкнутые треки\n"
+        "- /find текст: Найти трек среди ваших лайков и плейлистов\n"
         "- /create_playlist название: Создать новый плейлист\n"
         "- /rename_playlist старое_название новое_название: Переименовать существующий плейлист\n"
         "- /delete_playlist название: Удалить плейлист\n"
         "- /add_to_playlist название_плейлиста track_id: Добавить трек в плейлист\n"
         "- /remove_from_playlist название_плейлиста track_id: Удалить трек из плейлиста\n"
-        "- /playlists: Показать все ваши плейлисты (каждый плейлист — отдельным сообщением с кнопкой для просмотра содержимого)\n"
-        "- /play track_name_or_id: Предоставить 30-секундный фрагмент аудиофайла указанного трека из Spotify\n\n"
+        "- /playlists: Показать ваши плейлисты (с кнопками для просмотра содержимого)\n"
+        "- /play track_name_or_id: Предоставить 30-секундный фрагмент аудиофайла указанного трека из Spotify\n"
+        "- @имя_бота запрос: Поиск трека прямо в поле ввода любого чата\n\n"
     )
     await message.answer(help_text, parse_mode="HTML")
 
 
-async def auth_command_handler(message: Message, db_pool):
+async def auth_command_handler(message: Message, db_pool, known_users: set):
     """
     Handler for /auth command. Checks and returns message if user is authenticated.
     """
     telegram_id = message.from_user.id
-    authenticated = await is_user_authenticated(db_pool, telegram_id)
-    await db_pool.log_all_users()
+    authenticated = await is_user_authenticated(db_pool, telegram_id, known_users)
     if authenticated:
         await message.answer("✅ Вы успешно аутентифицированы!")
     else:
@@ -68,6 +74,57 @@ async def auth_command_handler(message: Message, db_pool):
         )
 
 
+def _render_search_result(idx: int, item: dict, search_type: str):
+    """
+    Builds the text and keyboard (a "Like" button for tracks) of one search result.
+    """
+    if search_type == "track":
+        track_id = item.get("id", "Unknown ID")
+        track_name = item.get("name", "Unknown Track")
+        artists = ", ".join(artist["name"] for artist in item.get("artists", []))
+        album_name = item.get("album", {}).get("name", "Unknown Album")
+
+        response = (
+            f"{idx}. **{track_name}**\n"
+            f"   - Исполнитель(и): {artists}\n"
+            f"   - Альбом: {album_name}\n"
+        )
+
+        keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(
+                        text=f"❤️ Лайк: {track_name}",
+                        callback_data=f"like:{track_id}",
+                    )
+                ]
+            ]
+        )
+        return response, keyboard
+    if search_type == "artist":
+        name = item.get("name", "Unknown Artist")
+        genres = ", ".join(item.get("genres", []))
+        return f"{idx}. **{name}**\n   - Жанры: {genres or 'Не указаны'}\n\n", None
+    name = item.get("name", "Unknown Album")
+    artists = ", ".join(artist["name"] for artist in item.get("artists", []))
+    release_date = item.get("release_date", "Unknown Date")
+    response = (
+        f"{idx}. **{name}**\n"
+        f"   - Исполнитель(и): {artists}\n"
+        f"   - Дата релиза: {release_date}\n"
+    )
+    return response, None
+
+
+def _circuit_open_text(error: CircuitOpenError) -> str:
+    """
+    Tells the user Spotify is unavailable and, if known, when to try again.
+    """
+    if error.retry_in is None:
+        return str(error)
+    return f"Spotify сейчас недоступен, попробуйте через {error.retry_in:.0f} с."
+
+
 async def search_command_handler(message: Message, command: CommandObject, db_pool):
     """
     Handler for /search command. Finds track, artist and album names in Spotify.
@@ -94,9 +151,16 @@ async def search_command_handler(message: Message, command: CommandObject, db_po
         return
 
     try:
-        results = spotify.search(query, search_type=search_type, limit=5)
+        results = await get_spotify().search(query, search_type=search_type, limit=5)
+    except CircuitOpenError as e:
+        await message.reply(_circuit_open_text(e))
+        return
+    except SpotifyUnavailableError as e:
+        await message.reply(str(e))
+        return
     except Exception as e:
-        await message.reply(f"Произошла ошибка при запросе к Spotify API: {e}")
+        logging.error(f"Ошибка поиска в Spotify: {e}")
+        await message.reply("Не удалось выполнить поиск в Spotify, попробуйте позже.")
         return
 
     items = results.get(f"{search_type}s", {}).get("items", [])
@@ -104,46 +168,16 @@ async def search_command_handler(message: Message, command: CommandObject, db_po
         await message.reply("Ничего не найдено. Попробуйте изменить запрос.")
         return
 
-    for idx, item in enumerate(items, start=1):
-        if search_type == "track":
-            track_id = item.get("id", "Unknown ID")
-            track_name = item.get("name", "Unknown Track")
-            artists = ", ".join(artist["name"] for artist in item.get("artists", []))
-            album_name = item.get("album", {}).get("name", "Unknown Album")
-
-            response = (
-                f"{idx}. **{track_name}**\n"
-                f"   - Исполнитель(и): {artists}\n"
-                f"   - Альбом: {album_name}\n"
-            )
-
-            keyboard = InlineKeyboardMarkup(
-                inline_keyboard=[
-                    [
-                        InlineKeyboardButton(
-                            text=f"❤️ Лайк: {track_name}",
-                            callback_data=f"like:{track_id}",
-                        )
-                    ]
-                ]
-            )
-
-            await message.answer(response, reply_markup=keyboard, parse_mode="Markdown")
-        elif search_type == "artist":
-            name = item.get("name", "Unknown Artist")
-            genres = ", ".join(item.get("genres", []))
-            response = f"{idx}. **{name}**\n   - Жанры: {genres or 'Не указаны'}\n\n"
-            await message.answer(response, parse_mode="Markdown")
-        elif search_type == "album":
-            name = item.get("name", "Unknown Album")
-            artists = ", ".join(artist["name"] for artist in item.get("artists", []))
-            release_date = item.get("release_date", "Unknown Date")
-            response = (
-                f"{idx}. **{name}**\n"
-                f"   - Исполнитель(и): {artists}\n"
-                f"   - Дата релиза: {release_date}\n"
-            )
-            await message.answer(response, parse_mode="Markdown")
+    messages = [
+        _render_search_result(idx, item, search_type)
+        for idx, item in enumerate(items, start=1)
+    ]
+    text, keyboard = messages[0]
+    await message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    # The first result answers the user; the rest must not hold up other chats.
+    with bulk():
+        for text, keyboard in messages[1:]:
+            await message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
 
 
 async def like_track_callback_handler(callback_query: CallbackQuery, db_pool):
@@ -159,41 +193,147 @@ async def like_track_callback_handler(callback_query: CallbackQuery, db_pool):
     user_id = callback_query.from_user.id
 
     try:
-        track = spotify.get_track(track_id)
-        track_name = track.get("name", "Unknown Track")
-        artists = ", ".join(artist["name"] for artist in track.get("artists", []))
-        album_name = track.get("album", {}).get("name", "Unknown Album")
+        track = SpotifyAPI.track_summary(await get_spotify().get_track(track_id))
+        track_name = track["track_name"]
 
-        await save_liked_track(
-            db_pool, user_id, track_id, track_name, artists, album_name
-        )
-        await callback_query.answer(
-            f"Трек '{track_name}' добавлен в ваши лайки!", show_alert=True
+        liked = await save_liked_track(
+            db_pool,
+            user_id,
+            track_id,
+            track_name,
+            track["artist_name"],
+            track["album_name"],
         )
+        if liked:
+            await callback_query.answer(
+                f"Трек '{track_name}' добавлен в ваши лайки!", show_alert=True
+            )
+        else:
+            await callback_query.answer(
+                f"Трек '{track_name}' уже есть в ваших лайках.", show_alert=True
+            )
+    except CircuitOpenError as e:
+        await callback_query.answer(_circuit_open_text(e), show_alert=True)
     except Exception as e:
         await callback_query.answer(
             f"Ошибка при добавлении трека: {e}", show_alert=True
         )
 
 
+def _render_likes_page(page: dict):
+    """
+    Builds the text and the prev/next keyboard for one page of liked tracks.
+    """
+    text = "Ваши лайкнутые треки:\n\n"
+    for track in page["tracks"]:
+        text += (
+            f"🎵 <b>{escape(track['track_name'])}</b>\n"
+            f"   - Исполнитель(и): {escape(track['artist_name'])}\n"
+            f"   - Альбом: {escape(track['album_name'])}\n\n"
+        )
+
+    buttons = []
+    if page["has_prev"]:
+        buttons.append(
+            InlineKeyboardButton(
+                text="⬅️ Назад",
+                callback_data=f"likes_page:prev:{page['tracks'][0]['id']}",
+            )
+        )
+    if page["has_next"]:
+        buttons.append(
+            InlineKeyboardButton(
+                text="Вперёд ➡️",
+                callback_data=f"likes_page:next:{page['tracks'][-1]['id']}",
+            )
+        )
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return text, keyboard
+
+
 async def likes_command_handler(message: Message, db_pool):
     """
-    Handler for /likes command. Displays the user's liked tracks.
+    Handler for /likes command. Displays the first page of the user's liked tracks.
     """
     user_id = message.from_user.id
-    liked_tracks = await get_liked_tracks(db_pool, user_id)
+    page = await get_liked_tracks_page(db_pool, user_id, LIKES_PAGE_SIZE)
 
-    if not liked_tracks:
+    if not page["tracks"]:
         await message.reply(
             "У вас пока нет лайкнутых треков. Начните с команды /search и лайкните понравившиеся треки!"
         )
         return
 
-    response = "Ваши лайкнутые треки:\n\n"
-    for idx, track in enumerate(liked_tracks, start=1):
-        response += f"{idx}. **{track['track_name']}**\n   - Исполнитель(и): {track['artist_name']}\n   - Альбом: {track['album_name']}\n\n"
+    text, keyboard = _render_likes_page(page)
+    await message.reply(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+async def likes_page_callback_handler(callback_query: CallbackQuery, db_pool):
+    """
+    Handler for the prev/next buttons under /likes. Fetches only the adjacent page.
+    """
+    try:
+        _, direction, cursor = (callback_query.data or "").split(":", 2)
+        cursor_id = int(cursor)
+    except ValueError:
+        await callback_query.answer("Неверный формат запроса.", show_alert=True)
+        return
+    if not isinstance(callback_query.message, Message):
+        # Too old to be edited.
+        await callback_query.answer("Сообщение устарело, отправьте /likes.")
+        return
 
-    await message.reply(response, parse_mode="Markdown")
+    user_id = callback_query.from_user.id
+    if direction == "prev":
+        page = await get_liked_tracks_page(
+            db_pool, user_id, LIKES_PAGE_SIZE, after_id=cursor_id
+        )
+    else:
+        page = await get_liked_tracks_page(
+            db_pool, user_id, LIKES_PAGE_SIZE, before_id=cursor_id
+        )
+
+    if not page["tracks"]:
+        await callback_query.answer("Больше треков нет.")
+        return
+
+    text, keyboard = _render_likes_page(page)
+    await callback_query.message.edit_text(
+        text, reply_markup=keyboard, parse_mode="HTML"
+    )
+    await callback_query.answer()
+
+
+async def find_command_handler(message: Message, command: CommandObject, db_pool):
+    """
+    Handler for /find command. Searches the user's liked and playlist tracks
+    locally, without a request to Spotify.
+    """
+    if message.from_user is None:
+        # Channel posts have no author whose library could be searched.
+        return
+    if not command.args:
+        await message.reply(
+            "Пожалуйста, укажите, что искать. Пример: /find imagine dragons"
+        )
+        return
+
+    tracks = await search_library(
+        db_pool, message.from_user.id, command.args, FIND_RESULTS
+    )
+    if not tracks:
+        await message.reply("В ваших лайках и плейлистах ничего не найдено.")
+        return
+
+    text = "Найдено в вашей библиотеке:\n\n"
+    for track in tracks:
+        text += (
+            f"🎵 <b>{escape(track['track_name'] or track['track_id'])}</b>\n"
+            f"   - Исполнитель(и): {escape(track['artist_name'])}\n"
+            f"   - Альбом: {escape(track['album_name'])}\n"
+            f"   - ID: <code>{escape(track['track_id'])}</code>\n\n"
+        )
+    await message.reply(text, parse_mode="HTML")
 
 
 def register_main_handlers(dp):
@@ -202,6 +342,11 @@ def register_main_handlers(dp):
     dp.message.register(auth_command_handler, Command("auth"))
     dp.message.register(search_command_handler, Command("search"))
     dp.message.register(likes_command_handler, Command("likes"))
+    dp.message.register(find_command_handler, Command("find"))
     dp.callback_query.register(
         like_track_callback_handler, lambda call: call.data.startswith("like:")
     )
+    dp.callback_query.register(
+        likes_page_callback_handler,
+        lambda call: call.data.startswith("likes_page:"),
+    )
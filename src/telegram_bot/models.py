@@ -1,8 +1,29 @@
-from src.telegram_bot.database import Database
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+import json
+import re
+import sqlite3
+import unicodedata
+from src.telegram_bot.database import Database, Transaction
+from src.telegram_bot.sql_scripts import (
+    ADD_TO_LIBRARY,
+    INDEX_LIBRARY_ENTRIES,
+    PRUNE_LIBRARY,
+    SYNC_LIBRARY_TRACK,
+    UNINDEX_LIBRARY_ENTRIES,
+    UPSERT_TRACK,
+)
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    text,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
-from typing import Any
+from typing import Any, Iterable, List, Optional
 
 Base: Any = declarative_base()
 
@@ -16,17 +37,29 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.now)
 
 
+class Track(Base):
+    __tablename__ = "tracks"
+
+    id = Column(String, primary_key=True)  # Spotify track id
+    name = Column(String, nullable=False)
+    artist_name = Column(String, nullable=False)
+    album_name = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.now)
+
+
 class LikedTrack(Base):
     __tablename__ = "liked_tracks"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, nullable=False)  # Foreign key reference to User.id
-    track_id = Column(String, nullable=False)
-    track_name = Column(String, nullable=False)
-    artist_name = Column(String, nullable=False)
-    album_name = Column(String, nullable=False)
+    track_id = Column(String, ForeignKey("tracks.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.now)
 
+    __table_args__ = (
+        Index("idx_liked_tracks_track", "track_id"),
+        Index("idx_liked_tracks_user", "user_id", "id"),
+    )
+
 
 class Playlist(Base):
     __tablename__ = "playlists"
@@ -38,6 +71,16 @@ class Playlist(Base):
     )
     created_at = Column(DateTime, default=datetime.now)
 
+    __table_args__ = (
+        Index(
+            "idx_playlists_user_created",
+            "user_id",
+            text("created_at DESC"),
+            "id",
+            "name",
+        ),
+    )
+
 
 class PlaylistTrack(Base):
     __tablename__ = "playlist_tracks"
@@ -46,55 +89,134 @@ class PlaylistTrack(Base):
     playlist_id = Column(
         Integer, ForeignKey("playlists.id", ondelete="CASCADE"), nullable=False
     )
-    track_id = Column(String, nullable=False)
+    track_id = Column(String, ForeignKey("tracks.id"), nullable=False)
     added_at = Column(DateTime, default=datetime.now)
 
+    __table_args__ = (
+        Index("idx_playlist_tracks_track", "track_id"),
+        Index("idx_playlist_tracks_playlist", "playlist_id", "id"),
+    )
+
+
+class LibraryEntry(Base):
+    __tablename__ = "library"
+
+    id = Column(Integer, primary_key=True)  # rowid of the entry in library_fts
+    user_id = Column(Integer, nullable=False)
+    track_id = Column(String, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "track_id"),
+        Index("idx_library_track", "track_id"),
+    )
+
 
-async def save_user(db: Database, telegram_id: int, username: str):
+class PreviewFile(Base):
+    __tablename__ = "preview_files"
+
+    url_hash = Column(String, primary_key=True)  # SHA-256 of the preview URL
+    file_id = Column(String, nullable=False)  # Telegram file_id of the uploaded audio
+    updated_at = Column(DateTime, default=datetime.now)
+
+
+async def _add_to_library(tx: Transaction, user_id: int, track_ids: Iterable[str]):
     """
-    Сохраняет пользователя в базу данных.
+    Добавляет треки в библиотеку пользователя и в её полнотекстовый индекс.
     """
-    existing_user = await db.fetchone(
-        "SELECT id FROM users WHERE telegram_id = ?;", (telegram_id,)
-    )
-    if existing_user:
-        print(f"User with telegram_id={telegram_id} already exists: {existing_user}")
-        if existing_user[0] is None:  # Если id=NULL
-            print(f"User with telegram_id={telegram_id} has NULL id. Fixing...")
-            await db.execute("DELETE FROM users WHERE telegram_id = ?;", (telegram_id,))
-            await db.execute(
-                """
-                INSERT INTO users (telegram_id, username, created_at)
-                VALUES (?, ?, ?);
-                """,
-                (telegram_id, username, datetime.now()),
-            )
-    else:
-        print(f"Saving user: telegram_id={telegram_id}, username={username}")
-        await db.execute(
-            """
-            INSERT INTO users (telegram_id, username, created_at)
-            VALUES (?, ?, ?);
-            """,
-            (telegram_id, username, datetime.now()),
+    new_ids: List[int] = []
+    for track_id in track_ids:
+        rows = await tx.execute_returning(ADD_TO_LIBRARY, (user_id, track_id))
+        new_ids.extend(row[0] for row in rows)
+    if new_ids:
+        await tx.execute(INDEX_LIBRARY_ENTRIES, (json.dumps(new_ids),))
+
+
+async def _prune_library(tx: Transaction, user_id: int, track_ids: Iterable[str]):
+    """
+    Убирает из библиотеки пользователя треки, которых нет ни в лайках,
+    ни в его плейлистах.
+    """
+    track_ids = list(track_ids)
+    if not track_ids:
+        return
+    rows = await tx.execute_returning(PRUNE_LIBRARY, (user_id, json.dumps(track_ids)))
+    if rows:
+        await tx.execute(
+            UNINDEX_LIBRARY_ENTRIES, (json.dumps([row[0] for row in rows]),)
         )
-    all_users = await db.fetchall("SELECT * FROM users;")
-    print(f"All users: {all_users}")
 
 
-async def is_user_authenticated(db: Database, telegram_id: int) -> bool:
+async def save_user(
+    db: Database, telegram_id: int, username: str, known_users: Optional[set] = None
+):
+    """
+    Сохраняет пользователя в базу данных или обновляет его username.
+    - known_users: Набор уже зарегистрированных telegram_id, пополняется при сохранении.
+    """
+    await db.execute(
+        """
+        INSERT INTO users (telegram_id, username, created_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(telegram_id) DO UPDATE SET username = excluded.username
+        WHERE users.username IS NOT excluded.username;
+        """,
+        (telegram_id, username, datetime.now()),
+    )
+    if known_users is not None:
+        known_users.add(telegram_id)
+
+
+async def is_user_authenticated(
+    db: Database, telegram_id: int, known_users: Optional[set] = None
+) -> bool:
     """
     Проверяет, существует ли пользователь в базе данных.
+    - known_users: Набор уже зарегистрированных telegram_id; повторные проверки
+      отвечаются из него без обращения к базе.
     """
+    if known_users is not None and telegram_id in known_users:
+        return True
     result = await db.fetchone(
         """
-        SELECT COUNT(*)
+        SELECT 1
         FROM users
         WHERE telegram_id = ?;
         """,
         (telegram_id,),
     )
-    return result[0] > 0
+    if result is None:
+        return False
+    if known_users is not None:
+        known_users.add(telegram_id)
+    return True
+
+
+async def save_track(
+    db: Database, track_id: str, track_name: str, artist_name: str, album_name: str
+):
+    """
+    Сохраняет трек в общий каталог или обновляет его метаданные.
+    """
+    params = (track_id, track_name, artist_name, album_name)
+    async with db.transaction() as tx:
+        await tx.execute(UPSERT_TRACK, params)
+        await tx.execute(SYNC_LIBRARY_TRACK, params)
+
+
+async def save_tracks(db: Database, tracks: list):
+    """
+    Сохраняет пачку треков в общий каталог.
+    - tracks: Список словарей с ключами track_id, track_name, artist_name, album_name.
+    """
+    if not tracks:
+        return
+    params = [
+        (t["track_id"], t["track_name"], t["artist_name"], t["album_name"])
+        for t in tracks
+    ]
+    async with db.transaction() as tx:
+        await tx.executemany(UPSERT_TRACK, params)
+        await tx.executemany(SYNC_LIBRARY_TRACK, params)
 
 
 async def save_liked_track(
@@ -104,144 +226,228 @@ async def save_liked_track(
     track_name: str,
     artist_name: str,
     album_name: str,
-):
+) -> bool:
     """
     Сохраняет лайкнутый трек в базу данных.
+    Возвращает False, если трек уже был в лайках пользователя.
     """
-    existing_track = await db.fetchone(
-        """
-        SELECT id
-        FROM liked_tracks
-        WHERE user_id = ? AND track_id = ?;
-        """,
-        (user_id, track_id),
-    )
-    if existing_track:
-        print(f"Track {track_id} already liked by user {user_id}")
-        return
-
-    print(f"Saving liked track: user_id={user_id}, track_id={track_id}")
-    await db.execute(
-        """
-        INSERT INTO liked_tracks (user_id, track_id, track_name, artist_name, album_name)
-        VALUES (?, ?, ?, ?, ?);
-        """,
-        (user_id, track_id, track_name, artist_name, album_name),
-    )
+    params = (track_id, track_name, artist_name, album_name)
+    async with db.transaction() as tx:
+        await tx.execute(UPSERT_TRACK, params)
+        await tx.execute(SYNC_LIBRARY_TRACK, params)
+        rows = await tx.execute_returning(
+            """
+            INSERT INTO liked_tracks (user_id, track_id)
+            VALUES (?, ?)
+            ON CONFLICT(user_id, track_id) DO NOTHING
+            RETURNING id;
+            """,
+            (user_id, track_id),
+        )
+        if rows:
+            await _add_to_library(tx, user_id, [track_id])
+    return bool(rows)
 
 
-async def get_liked_tracks(db: Database, user_id: int):
+async def get_liked_tracks_page(
+    db: Database,
+    user_id: int,
+    limit: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+):
     """
-    Получает все лайкнутые треки пользователя.
+    Получает одну страницу лайкнутых треков пользователя, от новых к старым.
+    - before_id: Вернуть треки старше лайка с этим id (следующая страница).
+    - after_id: Вернуть треки новее лайка с этим id (предыдущая страница).
+    Возвращает словарь с ключами tracks, has_prev и has_next.
     """
-    liked_tracks = await db.fetchall(
-        """
-        SELECT track_name, artist_name, album_name
-        FROM liked_tracks
-        WHERE user_id = ?;
-        """,
-        (user_id,),
-    )
-    return [
-        {
-            "track_name": track[0],
-            "artist_name": track[1],
-            "album_name": track[2],
-        }
-        for track in liked_tracks
-    ]
+    if after_id is not None:
+        rows = await db.fetchall(
+            """
+            SELECT lt.id, t.name, t.artist_name, t.album_name
+            FROM liked_tracks lt
+            JOIN tracks t ON t.id = lt.track_id
+            WHERE lt.user_id = ? AND lt.id > ?
+            ORDER BY lt.id ASC
+            LIMIT ?;
+            """,
+            (user_id, after_id, limit + 1),
+        )
+        has_prev = len(rows) > limit
+        rows = rows[:limit][::-1]
+        has_next = True
+    else:
+        rows = await db.fetchall(
+            """
+            SELECT lt.id, t.name, t.artist_name, t.album_name
+            FROM liked_tracks lt
+            JOIN tracks t ON t.id = lt.track_id
+            WHERE lt.user_id = ? AND lt.id < ?
+            ORDER BY lt.id DESC
+            LIMIT ?;
+            """,
+            (user_id, before_id if before_id is not None else 2**63 - 1, limit + 1),
+        )
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        has_prev = before_id is not None
+    return {
+        "tracks": [
+            {
+                "id": r[0],
+                "track_name": r[1],
+                "artist_name": r[2],
+                "album_name": r[3],
+            }
+            for r in rows
+        ],
+        "has_prev": has_prev,
+        "has_next": has_next,
+    }
 
 
 async def save_playlist(db: Database, user_id: int, playlist_name: str):
     """
     Сохраняет плейлист в базу данных.
+    Возвращает id нового плейлиста или None, если такой плейлист уже есть.
     """
-    existing_playlist = await db.fetchone(
-        """
-        SELECT id
-        FROM playlists
-        WHERE user_id = ? AND name = ?;
-        """,
-        (user_id, playlist_name),
-    )
-    if existing_playlist:
-        print(f"Playlist '{playlist_name}' already exists for user {user_id}")
-        return
-
-    print(f"Saving playlist: user_id={user_id}, playlist_name={playlist_name}")
-    await db.execute(
+    rows = await db.execute_returning(
         """
         INSERT INTO playlists (user_id, name, created_at)
-        VALUES (?, ?, ?);
+        VALUES (?, ?, ?)
+        ON CONFLICT(user_id, name) DO NOTHING
+        RETURNING id;
         """,
         (user_id, playlist_name, datetime.now()),
     )
+    return rows[0][0] if rows else None
 
 
-async def add_track_to_playlist(db: Database, playlist_id: int, track_id: str):
+async def rename_playlist(
+    db: Database, user_id: int, old_name: str, new_name: str
+) -> Optional[int]:
     """
-    Добавляет трек в указанный плейлист.
+    Переименовывает плейлист пользователя. Возвращает число изменённых строк
+    или None, если у пользователя уже есть плейлист с новым названием.
     """
-    existing_track = await db.fetchone(
-        """
-        SELECT id
-        FROM playlist_tracks
-        WHERE playlist_id = ? AND track_id = ?;
-        """,
-        (playlist_id, track_id),
-    )
-    if existing_track:
-        print(f"Track {track_id} already exists in playlist {playlist_id}")
-        return
+    try:
+        return await db.execute(
+            """
+            UPDATE playlists
+            SET name = ?
+            WHERE user_id = ? AND name = ?;
+            """,
+            (new_name, user_id, old_name),
+        )
+    except sqlite3.IntegrityError:
+        return None
 
-    print(f"Adding track {track_id} to playlist {playlist_id}")
-    await db.execute(
-        """
-        INSERT INTO playlist_tracks (playlist_id, track_id, added_at)
-        VALUES (?, ?, ?);
-        """,
-        (playlist_id, track_id, datetime.now()),
-    )
+
+async def delete_playlist(db: Database, user_id: int, playlist_name: str) -> int:
+    """
+    Удаляет плейлист пользователя вместе с его треками.
+    Возвращает число удалённых плейлистов.
+    """
+    async with db.transaction() as tx:
+        rows = await tx.execute_returning(
+            """
+            DELETE FROM playlist_tracks
+            WHERE playlist_id IN (
+                SELECT id FROM playlists WHERE user_id = ? AND name = ?
+            )
+            RETURNING track_id;
+            """,
+            (user_id, playlist_name),
+        )
+        deleted = await tx.execute(
+            """
+            DELETE FROM playlists
+            WHERE user_id = ? AND name = ?;
+            """,
+            (user_id, playlist_name),
+        )
+        await _prune_library(tx, user_id, {row[0] for row in rows})
+        return deleted
 
 
-async def remove_track_from_playlist(db: Database, playlist_id: int, track_id: str):
+async def add_track_to_user_playlist(
+    db: Database, user_id: int, playlist_name: str, track_id: str
+) -> int:
     """
-    Удаляет трек из указанного плейлиста.
+    Добавляет трек в плейлист пользователя по названию. Метаданные трека
+    подгружаются в каталог при просмотре плейлиста.
+    Возвращает 1, если трек добавлен, и 0, если плейлиста нет или трек уже в нём.
     """
-    print(f"Removing track {track_id} from playlist {playlist_id}")
-    await db.execute(
-        """
-        DELETE FROM playlist_tracks
-        WHERE playlist_id = ? AND track_id = ?;
-        """,
-        (playlist_id, track_id),
-    )
+    async with db.transaction() as tx:
+        rows = await tx.execute_returning(
+            """
+            INSERT INTO playlist_tracks (playlist_id, track_id, added_at)
+            SELECT id, ?, ? FROM playlists WHERE user_id = ? AND name = ?
+            ON CONFLICT(playlist_id, track_id) DO NOTHING
+            RETURNING id;
+            """,
+            (track_id, datetime.now(), user_id, playlist_name),
+        )
+        if rows:
+            await _add_to_library(tx, user_id, [track_id])
+    return len(rows)
 
 
-async def get_user_playlists(db: Database, user_id: int):
+async def remove_track_from_user_playlist(
+    db: Database, user_id: int, playlist_name: str, track_id: str
+) -> int:
     """
-    Получает все плейлисты пользователя.
+    Удаляет трек из плейлиста пользователя по названию плейлиста.
+    Возвращает число удалённых строк.
     """
-    rows = await db.fetchall(
+    async with db.transaction() as tx:
+        deleted = await tx.execute(
+            """
+            DELETE FROM playlist_tracks
+            WHERE track_id = ? AND playlist_id = (
+                SELECT id FROM playlists WHERE user_id = ? AND name = ?
+            );
+            """,
+            (track_id, user_id, playlist_name),
+        )
+        if deleted:
+            await _prune_library(tx, user_id, [track_id])
+    return deleted
+
+
+async def playlist_exists(db: Database, user_id: int, playlist_name: str) -> bool:
+    """
+    Проверяет, есть ли у пользователя плейлист с таким названием.
+    """
+    row = await db.fetchone(
         """
-        SELECT id, name FROM playlists WHERE user_id = ? ORDER BY created_at DESC;
+        SELECT 1 FROM playlists WHERE user_id = ? AND name = ?;
         """,
-        (user_id,),
+        (user_id, playlist_name),
     )
-    return [{"id": r[0], "name": r[1]} for r in rows]
+    return row is not None
 
 
-async def get_playlist_tracks(db: Database, playlist_id: int):
+async def get_user_playlists_page(db: Database, user_id: int, limit: int, page: int):
     """
-    Получает все треки для конкретного плейлиста.
+    Получает одну страницу плейлистов пользователя (нумерация страниц с 0).
+    Возвращает словарь с ключами playlists, has_prev и has_next.
     """
     rows = await db.fetchall(
         """
-        SELECT track_id FROM playlist_tracks WHERE playlist_id = ?;
+        SELECT id, name FROM playlists
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+        LIMIT ? OFFSET ?;
         """,
-        (playlist_id,),
+        (user_id, limit + 1, page * limit),
     )
-    return [{"track_id": r[0]} for r in rows]
+    return {
+        "playlists": [{"id": r[0], "name": r[1]} for r in rows[:limit]],
+        "has_prev": page > 0,
+        "has_next": len(rows) > limit,
+    }
 
 
 async def get_playlist_name(db: Database, playlist_id: int):
@@ -257,17 +463,169 @@ async def get_playlist_name(db: Database, playlist_id: int):
     return row[0] if row else None
 
 
-async def get_full_playlist_tracks(db: Database, playlist_id: int):
+async def get_playlist_tracks_page(
+    db: Database,
+    playlist_id: int,
+    limit: int,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+):
     """
-    Получает полную информацию о треках плейлиста.
+    Получает одну страницу треков плейлиста в порядке добавления.
+    - after_id: Вернуть треки, добавленные после строки с этим id (следующая страница).
+    - before_id: Вернуть треки, добавленные до строки с этим id (предыдущая страница).
+    Для треков, которых ещё нет в каталоге, метаданные равны None.
+    Возвращает словарь с ключами tracks, has_prev и has_next.
     """
+    if before_id is not None:
+        rows = await db.fetchall(
+            """
+            SELECT pt.id, pt.track_id, t.name, t.artist_name, t.album_name
+            FROM playlist_tracks pt
+            LEFT JOIN tracks t ON t.id = pt.track_id
+            WHERE pt.playlist_id = ? AND pt.id < ?
+            ORDER BY pt.id DESC
+            LIMIT ?;
+            """,
+            (playlist_id, before_id, limit + 1),
+        )
+        has_prev = len(rows) > limit
+        rows = rows[:limit][::-1]
+        has_next = True
+    else:
+        rows = await db.fetchall(
+            """
+            SELECT pt.id, pt.track_id, t.name, t.artist_name, t.album_name
+            FROM playlist_tracks pt
+            LEFT JOIN tracks t ON t.id = pt.track_id
+            WHERE pt.playlist_id = ? AND pt.id > ?
+            ORDER BY pt.id ASC
+            LIMIT ?;
+            """,
+            (playlist_id, after_id if after_id is not None else 0, limit + 1),
+        )
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        has_prev = after_id is not None
+    return {
+        "tracks": [
+            {
+                "id": r[0],
+                "track_id": r[1],
+                "track_name": r[2],
+                "artist_name": r[3],
+                "album_name": r[4],
+            }
+            for r in rows
+        ],
+        "has_prev": has_prev,
+        "has_next": has_next,
+    }
+
+
+_WORD = re.compile(r"\w+")
+
+
+def _search_words(text: str) -> list:
+    """
+    Splits text into words the way the library_fts tokenizer does: case-folded
+    and without diacritics.
+    """
+    text = text.casefold()
+    if not text.isascii():
+        decomposed = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _WORD.findall(text)
+
+
+def _library_score(words: list, fields: tuple) -> int:
+    score = 0
+    for weight, field in zip((4, 2, 1), fields):
+        tokens = _search_words(field)
+        if tokens == words:
+            # The whole field is the query, e.g. the exact track title.
+            score += weight * 4
+        for word in words:
+            if word in tokens:
+                score += weight * 2
+            elif any(token.startswith(word) for token in tokens):
+                score += weight
+    return score
+
+
+async def search_library(
+    db: Database, user_id: int, text: str, limit: int, candidates: int = 200
+):
+    """
+    Ищет треки в библиотеке пользователя (лайки и плейлисты) по названию,
+    исполнителю и альбому. Все слова запроса должны найтись; слова от двух
+    букв ищутся и как начало слова. Совпадения ранжируются по bm25 (название
+    весит больше исполнителя, исполнитель больше альбома); из `candidates`
+    лучших первыми идут совпадения целых слов.
+    """
+    words = _search_words(text)
+    if not words:
+        return []
+    terms = " ".join(f'"{word}"*' if len(word) > 1 else f'"{word}"' for word in words)
     rows = await db.fetchall(
         """
-        SELECT lt.track_name, lt.artist_name, lt.album_name
-        FROM playlist_tracks pt
-        JOIN liked_tracks lt ON pt.track_id = lt.track_id
-        WHERE pt.playlist_id = ?;
+        SELECT f.rowid, l.track_id, f.track_name, f.artist_name, f.album_name,
+               f.rank
+        FROM library_fts f
+        JOIN library l ON l.id = f.rowid
+        WHERE library_fts MATCH ? AND f.rank MATCH 'bm25(0.0, 4.0, 2.0, 1.0)'
+        ORDER BY f.rank
+        LIMIT ?;
         """,
-        (playlist_id,),
+        (
+            f'owner:"{user_id}" AND {{track_name artist_name album_name}}: ({terms})',
+            candidates,
+        ),
+    )
+    # bm25 is lower for better matches; it does not tell prefix hits from
+    # whole words, so the candidates are reordered by `_library_score` first.
+    rows.sort(key=lambda r: (-_library_score(words, r[2:5]), r[5]))
+    return [
+        {
+            "track_id": r[1],
+            "track_name": r[2],
+            "artist_name": r[3],
+            "album_name": r[4],
+        }
+        for r in rows[:limit]
+    ]
+
+
+async def get_preview_file_id(db: Database, url_hash: str) -> Optional[str]:
+    """
+    Получает Telegram file_id уже загруженного превью по хэшу его URL.
+    """
+    row = await db.fetchone(
+        "SELECT file_id FROM preview_files WHERE url_hash = ?;", (url_hash,)
+    )
+    return row[0] if row else None
+
+
+async def save_preview_file_id(db: Database, url_hash: str, file_id: str):
+    """
+    Сохраняет Telegram file_id загруженного превью.
+    """
+    await db.execute(
+        """
+        INSERT INTO preview_files (url_hash, file_id, updated_at)
+        VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(url_hash) DO UPDATE SET
+            file_id = excluded.file_id,
+            updated_at = excluded.updated_at;
+        """,
+        (url_hash, file_id),
+    )
+
+
+async def delete_preview_file_id(db: Database, url_hash: str) -> int:
+    """
+    Удаляет file_id превью, который Telegram больше не принимает.
+    """
+    return await db.execute(
+        "DELETE FROM preview_files WHERE url_hash = ?;", (url_hash,)
     )
-    return [{"track_name": r[0], "artist_name": r[1], "album_name": r[2]} for r in rows]
@@ -1,9 +1,45 @@
+import logging
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, CommandObject
-from aiogram.types import Message
-from main_handlers import spotify
+from aiogram.types import BufferedInputFile, Message
+from src.spotify.client import get_spotify
+from src.spotify.previews import PreviewCache
+from src.telegram_bot.models import (
+    delete_preview_file_id,
+    get_preview_file_id,
+    save_preview_file_id,
+)
 
 
-async def play_command_handler(message: Message, command: CommandObject):
+async def _send_preview(message: Message, db_pool, preview_url: str, **audio):
+    """
+    Sends a preview as audio. Previews uploaded before are resent by their
+    Telegram file_id, so nothing is downloaded or uploaded again; otherwise the
+    preview is uploaded (from the on-disk preview cache if it is there) and its
+    file_id is saved.
+    """
+    url_hash = PreviewCache.key(preview_url)
+    file_id = await get_preview_file_id(db_pool, url_hash)
+    if file_id:
+        try:
+            await message.answer_audio(audio=file_id, **audio)
+            return
+        except TelegramBadRequest as e:
+            logging.warning(f"Telegram не принял file_id превью {url_hash}: {e}")
+            await delete_preview_file_id(db_pool, url_hash)
+
+    content = await get_spotify().download_preview(preview_url)
+    sent = await message.answer_audio(
+        audio=BufferedInputFile(
+            content, filename=f"{audio.get('title', 'preview')}.mp3"
+        ),
+        **audio,
+    )
+    if sent.audio:
+        await save_preview_file_id(db_pool, url_hash, sent.audio.file_id)
+
+
+async def play_command_handler(message: Message, command: CommandObject, db_pool):
     """
     Handler for /play command.
     Fetches a track by its name or ID from Spotify and sends a 30-second preview to the user.
@@ -16,7 +52,7 @@ async def play_command_handler(message: Message, command: CommandObject):
 
     query = command.args.strip()
     try:
-        results = spotify.search(query, search_type="track", limit=1)
+        results = await get_spotify().search(query, search_type="track", limit=1)
         tracks = results.get("tracks", {}).get("items", [])
         episodes = results.get("episodes", {}).get("items", [])
         print(results)
@@ -36,10 +72,10 @@ async def play_command_handler(message: Message, command: CommandObject):
                 )
                 return
 
-            audio_data = await spotify.download_preview(preview_url)
-
-            await message.answer_audio(
-                audio=audio_data,
+            await _send_preview(
+                message,
+                db_pool,
+                preview_url,
                 title=track_name,
                 performer=artists,
                 caption=f"🎵 {track_name}\n👤 {artists}",
@@ -58,10 +94,10 @@ async def play_command_handler(message: Message, command: CommandObject):
                 )
                 return
 
-            audio_data = await spotify.download_preview(preview_url)
-
-            await message.answer_audio(
-                audio=audio_data,
+            await _send_preview(
+                message,
+                db_pool,
+                preview_url,
                 title=episode_name,
                 caption=f"🎧 {episode_name}\nПредпрослушивание эпизода.",
             )
@@ -1,14 +1,24 @@
+import logging
+from html import escape
 from aiogram.types import Message, InlineKeyboardButton, CallbackQuery
 from aiogram.filters import Command
 from src.telegram_bot.models import (
     save_playlist,
-    add_track_to_playlist,
-    remove_track_from_playlist,
-    get_user_playlists,
-    get_full_playlist_tracks,
+    rename_playlist,
+    delete_playlist,
+    add_track_to_user_playlist,
+    remove_track_from_user_playlist,
+    playlist_exists,
+    get_user_playlists_page,
+    get_playlist_tracks_page,
     get_playlist_name,
+    save_tracks,
 )
 from aiogram.utils.keyboard import InlineKeyboardMarkup
+from src.spotify.client import SpotifyAPI, get_spotify
+
+PLAYLISTS_PAGE_SIZE = 10
+PLAYLIST_TRACKS_PAGE_SIZE = 10
 
 
 async def create_playlist_handler(message: Message, db_pool):
@@ -26,8 +36,10 @@ async def create_playlist_handler(message: Message, db_pool):
     user_id = message.from_user.id
 
     try:
-        await save_playlist(db_pool, user_id, playlist_name)
-        await message.reply(f"✅ Плейлист '{playlist_name}' создан успешно!")
+        if await save_playlist(db_pool, user_id, playlist_name) is None:
+            await message.reply(f"❌ Плейлист '{playlist_name}' уже существует.")
+        else:
+            await message.reply(f"✅ Плейлист '{playlist_name}' создан успешно!")
     except Exception as e:
         await message.reply(f"❌ Ошибка при создании плейлиста: {e}")
 
@@ -46,15 +58,11 @@ async def rename_playlist_handler(message: Message, db_pool):
     old_name, new_name = args[1], args[2]
     user_id = message.from_user.id
 
-    query = """
-    UPDATE playlists
-    SET name = ?
-    WHERE name = ? AND user_id = ?;
-    """
-
     try:
-        result = await db_pool.execute(query, (new_name, old_name, user_id))
-        if result == "UPDATE 0":
+        renamed = await rename_playlist(db_pool, user_id, old_name, new_name)
+        if renamed is None:
+            await message.reply(f"❌ Плейлист '{new_name}' уже существует.")
+        elif not renamed:
             await message.reply("❌ Плейлист с таким названием не найден.")
         else:
             await message.reply(
@@ -78,14 +86,8 @@ async def delete_playlist_handler(message: Message, db_pool):
     playlist_name = args[1]
     user_id = message.from_user.id
 
-    query = """
-    DELETE FROM playlists
-    WHERE name = ? AND user_id = ?;
-    """
-
     try:
-        result = await db_pool.execute(query, (playlist_name, user_id))
-        if result == "DELETE 0":
+        if not await delete_playlist(db_pool, user_id, playlist_name):
             await message.reply("❌ Плейлист с таким названием не найден.")
         else:
             await message.reply(f"✅ Плейлист '{playlist_name}' удалён!")
@@ -107,20 +109,17 @@ async def add_to_playlist_handler(message: Message, db_pool):
     playlist_name, track_id = args[1], args[2]
     user_id = message.from_user.id
 
-    query_playlist = """
-    SELECT id FROM playlists WHERE name = ? AND user_id = ?;
-    """
-
     try:
-        playlist_id = await db_pool.fetchone(query_playlist, (playlist_name, user_id))
-        if not playlist_id:
+        if await add_track_to_user_playlist(db_pool, user_id, playlist_name, track_id):
+            await message.reply(
+                f"✅ Трек '{track_id}' добавлен в плейлист '{playlist_name}'!"
+            )
+        elif await playlist_exists(db_pool, user_id, playlist_name):
+            await message.reply(
+                f"Трек '{track_id}' уже есть в плейлисте '{playlist_name}'."
+            )
+        else:
             await message.reply("❌ Плейлист с таким названием не найден.")
-            return
-
-        await add_track_to_playlist(db_pool, playlist_id[0], track_id)
-        await message.reply(
-            f"✅ Трек '{track_id}' добавлен в плейлист '{playlist_name}'!"
-        )
     except Exception as e:
         await message.reply(f"❌ Ошибка при добавлении трека в плейлист: {e}")
 
@@ -139,57 +138,184 @@ async def remove_from_playlist_handler(message: Message, db_pool):
     playlist_name, track_id = args[1], args[2]
     user_id = message.from_user.id
 
-    query_playlist = """
-    SELECT id FROM playlists WHERE name = ? AND user_id = ?;
-    """
-
     try:
-        playlist_id = await db_pool.fetchone(query_playlist, (playlist_name, user_id))
-        if not playlist_id:
+        if await remove_track_from_user_playlist(
+            db_pool, user_id, playlist_name, track_id
+        ):
+            await message.reply(
+                f"✅ Трек '{track_id}' удалён из плейлиста '{playlist_name}'!"
+            )
+        elif await playlist_exists(db_pool, user_id, playlist_name):
+            await message.reply(f"❌ Трека '{track_id}' нет в плейлисте.")
+        else:
             await message.reply("❌ Плейлист с таким названием не найден.")
-            return
-
-        await remove_track_from_playlist(db_pool, playlist_id[0], track_id)
-        await message.reply(
-            f"✅ Трек '{track_id}' удалён из плейлиста '{playlist_name}'!"
-        )
     except Exception as e:
         await message.reply(f"❌ Ошибка при удалении трека из плейлиста: {e}")
 
 
+def _render_playlists_page(page: dict, page_number: int):
+    """
+    Builds the text and keyboard (open buttons plus paging) for a page of playlists.
+    """
+    text = "🎵 <b>Ваши плейлисты:</b>\n\n"
+    rows = []
+    for idx, pl in enumerate(page["playlists"], page_number * PLAYLISTS_PAGE_SIZE + 1):
+        text += f"{idx}. {escape(pl['name'])}\n"
+        rows.append(
+            [
+                InlineKeyboardButton(
+                    text=f"Открыть: {pl['name']}",
+                    callback_data=f"show_playlist:{pl['id']}",
+                )
+            ]
+        )
+
+    nav = []
+    if page["has_prev"]:
+        nav.append(
+            InlineKeyboardButton(
+                text="⬅️ Назад", callback_data=f"playlists_page:{page_number - 1}"
+            )
+        )
+    if page["has_next"]:
+        nav.append(
+            InlineKeyboardButton(
+                text="Вперёд ➡️", callback_data=f"playlists_page:{page_number + 1}"
+            )
+        )
+    if nav:
+        rows.append(nav)
+    return text, InlineKeyboardMarkup(inline_keyboard=rows)
+
+
 async def view_playlists_handler(message: Message, db_pool):
     """
     Handler for /playlists command.
-    Shows list of playlists in separated messages with a button to show all playlist's tracks.
+    Shows one page of playlists in a single message with a button to open each of them.
     """
     user_id = message.from_user.id
 
-    playlists = await get_user_playlists(db_pool, user_id)
+    page = await get_user_playlists_page(db_pool, user_id, PLAYLISTS_PAGE_SIZE, 0)
 
-    if not playlists:
+    if not page["playlists"]:
         await message.reply(
             "У вас пока нет плейлистов. Создайте их через /create_playlist!"
         )
         return
 
-    for pl in playlists:
-        pl_id, pl_name = pl["id"], pl["name"]
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text="Просмотреть плейлист",
-                        callback_data=f"show_playlist:{pl_id}",
-                    )
-                ]
-            ]
+    text, keyboard = _render_playlists_page(page, 0)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+async def playlists_page_callback_handler(callback_query: CallbackQuery, db_pool):
+    """
+    Handler for the paging buttons under /playlists.
+    """
+    try:
+        page_number = max(int((callback_query.data or "").split(":", 1)[1]), 0)
+    except (IndexError, ValueError):
+        await callback_query.answer("Неверный формат запроса.", show_alert=True)
+        return
+    if not isinstance(callback_query.message, Message):
+        # Too old to be edited.
+        await callback_query.answer("Сообщение устарело, отправьте /playlists.")
+        return
+
+    user_id = callback_query.from_user.id
+    page = await get_user_playlists_page(
+        db_pool, user_id, PLAYLISTS_PAGE_SIZE, page_number
+    )
+    if not page["playlists"]:
+        await callback_query.answer("Больше плейлистов нет.")
+        return
+
+    text, keyboard = _render_playlists_page(page, page_number)
+    await callback_query.message.edit_text(
+        text, reply_markup=keyboard, parse_mode="HTML"
+    )
+    await callback_query.answer()
+
+
+async def _fill_missing_tracks(db_pool, tracks: list, missing: list):
+    """
+    Fetches metadata for playlist tracks absent from the catalog and stores it.
+    If Spotify is unavailable, the track id is shown instead of the name.
+    """
+    try:
+        fetched = await get_spotify().get_tracks(missing)
+    except Exception as e:
+        logging.warning(f"Не удалось получить метаданные треков: {e}")
+        fetched = [None] * len(missing)
+
+    found = {}
+    for track_id, item in zip(missing, fetched):
+        if item is not None:
+            found[track_id] = {**SpotifyAPI.track_summary(item), "track_id": track_id}
+    await save_tracks(db_pool, list(found.values()))
+
+    for track in tracks:
+        if track["track_name"] is None:
+            track.update(
+                found.get(
+                    track["track_id"],
+                    {
+                        "track_name": track["track_id"],
+                        "artist_name": "—",
+                        "album_name": "—",
+                    },
+                )
+            )
+
+
+def _render_playlist_tracks_page(playlist_id: int, pl_name: str, page: dict):
+    """
+    Builds the text and prev/next keyboard for one page of a playlist's tracks.
+    """
+    text = f"🎼 <b>{escape(pl_name)}</b>\nТреки:\n"
+    for track in page["tracks"]:
+        text += (
+            f"• {escape(track['track_name'])}\n"
+            f"   - Исполнитель(и): {escape(track['artist_name'])}\n"
+            f"   - Альбом: {escape(track['album_name'])}\n\n"
+        )
+
+    buttons = []
+    if page["has_prev"]:
+        buttons.append(
+            InlineKeyboardButton(
+                text="⬅️ Назад",
+                callback_data=(
+                    f"playlist_tracks:{playlist_id}:prev:{page['tracks'][0]['id']}"
+                ),
+            )
         )
-        await message.answer(
-            f"🎵 <b>{pl_name}</b>", reply_markup=keyboard, parse_mode="HTML"
+    if page["has_next"]:
+        buttons.append(
+            InlineKeyboardButton(
+                text="Вперёд ➡️",
+                callback_data=(
+                    f"playlist_tracks:{playlist_id}:next:{page['tracks'][-1]['id']}"
+                ),
+            )
         )
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return text, keyboard
+
+
+async def _load_playlist_tracks_page(db_pool, playlist_id: int, **cursor):
+    page = await get_playlist_tracks_page(
+        db_pool, playlist_id, PLAYLIST_TRACKS_PAGE_SIZE, **cursor
+    )
+    missing = [t["track_id"] for t in page["tracks"] if t["track_name"] is None]
+    if missing:
+        await _fill_missing_tracks(db_pool, page["tracks"], missing)
+    return page
 
 
 async def show_playlist_callback_handler(callback_query: CallbackQuery, db_pool):
+    """
+    Handler for the "open" button of a playlist. Sends the first page of its tracks.
+    """
     data = callback_query.data
     if not data.startswith("show_playlist:"):
         await callback_query.answer("Неверный формат запроса.", show_alert=True)
@@ -200,20 +326,52 @@ async def show_playlist_callback_handler(callback_query: CallbackQuery, db_pool)
     if not pl_name:
         pl_name = "Неизвестный плейлист"
 
-    tracks = await get_full_playlist_tracks(db_pool, playlist_id)
-    if not tracks:
+    page = await _load_playlist_tracks_page(db_pool, playlist_id)
+    if not page["tracks"]:
         await callback_query.message.answer(
-            f"Плейлист <b>{pl_name}</b> пуст.", parse_mode="HTML"
+            f"Плейлист <b>{escape(pl_name)}</b> пуст.", parse_mode="HTML"
         )
     else:
-        text = f"🎼 <b>{pl_name}</b>\nТреки:\n"
-        for idx, track in enumerate(tracks, 1):
-            text += (
-                f"{idx}. {track['track_name']}\n"
-                f"   - Исполнитель(и): {track['artist_name']}\n"
-                f"   - Альбом: {track['album_name']}\n\n"
-            )
-        await callback_query.message.answer(text, parse_mode="HTML")
+        text, keyboard = _render_playlist_tracks_page(playlist_id, pl_name, page)
+        await callback_query.message.answer(
+            text, reply_markup=keyboard, parse_mode="HTML"
+        )
+    await callback_query.answer()
+
+
+async def playlist_tracks_callback_handler(callback_query: CallbackQuery, db_pool):
+    """
+    Handler for the prev/next buttons under a playlist. Fetches only the adjacent page.
+    """
+    try:
+        _, playlist, direction, cursor = (callback_query.data or "").split(":", 3)
+        playlist_id, cursor_id = int(playlist), int(cursor)
+    except ValueError:
+        await callback_query.answer("Неверный формат запроса.", show_alert=True)
+        return
+    if not isinstance(callback_query.message, Message):
+        # Too old to be edited.
+        await callback_query.answer("Сообщение устарело, откройте плейлист заново.")
+        return
+
+    pl_name = await get_playlist_name(db_pool, playlist_id) or "Неизвестный плейлист"
+    if direction == "prev":
+        page = await _load_playlist_tracks_page(
+            db_pool, playlist_id, before_id=cursor_id
+        )
+    else:
+        page = await _load_playlist_tracks_page(
+            db_pool, playlist_id, after_id=cursor_id
+        )
+
+    if not page["tracks"]:
+        await callback_query.answer("Больше треков нет.")
+        return
+
+    text, keyboard = _render_playlist_tracks_page(playlist_id, pl_name, page)
+    await callback_query.message.edit_text(
+        text, reply_markup=keyboard, parse_mode="HTML"
+    )
     await callback_query.answer()
 
 
@@ -227,3 +385,10 @@ def register_playlist_handlers(dp):
     dp.callback_query.register(
         show_playlist_callback_handler, lambda c: c.data.startswith("show_playlist:")
     )
+    dp.callback_query.register(
+        playlists_page_callback_handler, lambda c: c.data.startswith("playlists_page:")
+    )
+    dp.callback_query.register(
+        playlist_tracks_callback_handler,
+        lambda c: c.data.startswith("playlist_tracks:"),
+    )
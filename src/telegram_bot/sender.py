@@ -0,0 +1,364 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from config.settings import (
+    TELEGRAM_CHAT_BURST,
+    TELEGRAM_CHAT_RATE,
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_GROUP_RATE,
+    TELEGRAM_SEND_RETRIES,
+)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk"}
+_OUTGOING_PREFIXES = ("send", "copy", "forward", "edit")
+
+_send_priority: ContextVar[int] = ContextVar(
+    "send_priority", default=PRIORITY_INTERACTIVE
+)
+
+
+def _is_private(chat_id: Hashable) -> bool:
+    # Private chats have positive ids; groups and channels negative ones or
+    # an @username.
+    return isinstance(chat_id, int) and chat_id > 0
+
+
+@contextmanager
+def bulk() -> Iterator[None]:
+    """
+    Marks the messages sent inside the block as bulk output, so that
+    interactive replies to other users are sent before them.
+    """
+    token = _send_priority.set(PRIORITY_BULK)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Allows `rate` operations per second with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """
+        Returns how many seconds to wait until a token is available.
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, until: float):
+        """
+        Withholds tokens until `until`, e.g. after Telegram asked to retry later.
+        """
+        self.blocked_until = max(self.blocked_until, until)
+        self.tokens = 0.0
+        self.updated = max(self.updated, until)
+
+    def is_idle(self, now: float) -> bool:
+        return self.wait_time(now) == 0 and self.tokens >= self.capacity
+
+
+class SharedChatLimits:
+    """
+    Per-chat send limits shared by the processes of a worker pool, so that a
+    group whose members are served by different workers stays within its rate.
+    Each chat is hashed onto one slot of `slots` (a lock-protected
+    multiprocessing array of doubles) holding the time, on the monotonic clock
+    all processes share, its next send is due; two chats on one slot share a
+    limit, which only makes it stricter.
+    - rate / burst: Sends per second and burst size per chat.
+    """
+
+    def __init__(self, slots, rate: float, burst: float):
+        self.slots = slots
+        self.interval = 1 / rate
+        self.tolerance = (burst - 1) * self.interval
+
+    def reserve(self, chat_id: Hashable, now: float) -> float:
+        """
+        Takes a send slot for the chat and returns 0, or returns how many
+        seconds to wait until one is available without taking it.
+        """
+        # hash() of a str differs between processes.
+        index = zlib.crc32(str(chat_id).encode()) % len(self.slots)
+        with self.slots.get_lock():
+            due = max(self.slots[index], now)
+            if due - now > self.tolerance:
+                return due - self.tolerance - now
+            self.slots[index] = due + self.interval
+        return 0.0
+
+
+class _QueueStats:
+    def __init__(self, window: int = 1000):
+        self.backlog = 0
+        self.sent = 0
+        self.retries = 0
+        self.waits: Deque[float] = deque(maxlen=window)
+
+    def snapshot(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "backlog": self.backlog,
+            "sent": self.sent,
+            "retries": self.retries,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "wait_max": waits[-1] if waits else 0.0,
+        }
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Request middleware for the bot session that queues outgoing messages and
+    releases them within Telegram's limits: a global token bucket for the whole
+    bot plus one bucket per chat. Interactive sends go before bulk ones, sends
+    to the same chat keep their order within a priority, and a "retry after"
+    answer from Telegram pauses that chat and resends the message.
+    - global_rate: Messages per second for the whole bot.
+    - chat_rate / chat_burst: Messages per second and burst size per private chat.
+    - group_rate: Messages per second per group or channel.
+    - shared_groups: Limits of groups and channels shared with other worker
+      processes; checked in addition to this process's own buckets.
+    - retries: How many times a send is retried after a flood-control error.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        chat_burst: float = TELEGRAM_CHAT_BURST,
+        group_rate: float = TELEGRAM_GROUP_RATE,
+        shared_groups: Optional[SharedChatLimits] = None,
+        retries: int = TELEGRAM_SEND_RETRIES,
+    ):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.shared_groups = shared_groups
+        self.retries = retries
+        self._global: Optional[TokenBucket] = None
+        self._chats: Dict[Hashable, TokenBucket] = {}
+        # One FIFO (a heap by arrival) per (priority, chat). Each queue has one
+        # entry in `_ready` keyed by its head, or in `_delayed` while its chat's
+        # bucket is empty, so a grant costs O(log n) however long the backlog.
+        self._queues: Dict[Tuple[int, Hashable], List[tuple]] = {}
+        self._ready: List[Tuple[int, int, Hashable]] = []
+        self._delayed: List[Tuple[float, int, int, Hashable]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._stats = {priority: _QueueStats() for priority in _PRIORITY_NAMES}
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        api_method = getattr(method, "__api_method__", "")
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not api_method.startswith(_OUTGOING_PREFIXES):
+            return await make_request(bot, method)
+
+        priority = _send_priority.get()
+        # A retried send keeps its place in the chat's queue.
+        seq = next(self._counter)
+        for _ in range(self.retries):
+            await self._acquire(chat_id, priority, seq)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self._stats[priority].retries += 1
+                logging.warning(
+                    f"Telegram попросил повторить отправку в чат {chat_id} "
+                    f"через {e.retry_after} с."
+                )
+                self._pause(chat_id, e.retry_after)
+        # The last attempt lets a flood-control error reach the caller.
+        await self._acquire(chat_id, priority, seq)
+        return await make_request(bot, method)
+
+    async def _acquire(self, chat_id: Hashable, priority: int, seq: int):
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        future = loop.create_future()
+        key = (priority, chat_id)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = []
+            heapq.heappush(self._ready, (priority, seq, chat_id))
+        heapq.heappush(queue, (seq, loop.time(), future))
+        self._stats[priority].backlog += 1
+        self._wakeup.set()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self._stats[priority].backlog -= 1
+            raise
+
+    def _pause(self, chat_id: Hashable, retry_after: float):
+        now = asyncio.get_running_loop().time()
+        self._chat_bucket(chat_id, now).block(now + retry_after)
+        self._wakeup.set()
+
+    def _global_bucket(self, now: float) -> TokenBucket:
+        if self._global is None:
+            self._global = TokenBucket(self.global_rate, self.global_rate, now)
+        return self._global
+
+    def _chat_bucket(self, chat_id: Hashable, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if _is_private(chat_id):
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            else:
+                # Groups and channels have a much lower per-minute limit.
+                bucket = TokenBucket(self.group_rate, self.chat_burst, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _dispatch(self):
+        """
+        Hands out send slots to queued waiters in (priority, arrival) order,
+        skipping chats whose bucket is empty, and sleeps until the next slot.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            now = loop.time()
+            delay = self._global_bucket(now).wait_time(now)
+            if not self._queues:
+                self._prune(now)
+                await self._wakeup.wait()
+                continue
+            if delay == 0:
+                delay = self._grant_next(now)
+                if delay == 0:
+                    continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _grant_next(self, now: float) -> Optional[float]:
+        """
+        Grants a slot to the first eligible waiter and returns 0, or returns
+        how long to wait before some waiter becomes eligible.
+        """
+        while self._delayed and self._delayed[0][0] <= now:
+            _, priority, seq, chat_id = heapq.heappop(self._delayed)
+            heapq.heappush(self._ready, (priority, seq, chat_id))
+        while self._ready:
+            priority, seq, chat_id = heapq.heappop(self._ready)
+            key = (priority, chat_id)
+            queue = self._queues[key]
+            while queue and queue[0][-1].done():
+                heapq.heappop(queue)
+            if not queue:
+                del self._queues[key]
+                continue
+            if queue[0][0] != seq:
+                # The head was cancelled, or a retried send went before it.
+                heapq.heappush(self._ready, (priority, queue[0][0], chat_id))
+                continue
+            wait = self._chat_bucket(chat_id, now).wait_time(now)
+            if (
+                wait == 0
+                and self.shared_groups is not None
+                and not _is_private(chat_id)
+            ):
+                wait = self.shared_groups.reserve(chat_id, now)
+            if wait > 0:
+                heapq.heappush(self._delayed, (now + wait, priority, seq, chat_id))
+                continue
+            _, enqueued, future = heapq.heappop(queue)
+            if queue:
+                heapq.heappush(self._ready, (priority, queue[0][0], chat_id))
+            else:
+                del self._queues[key]
+            self._chats[chat_id].consume(now)
+            self._global_bucket(now).consume(now)
+            stats = self._stats[priority]
+            stats.backlog -= 1
+            stats.sent += 1
+            stats.waits.append(now - enqueued)
+            future.set_result(None)
+            return 0
+        if self._delayed:
+            return self._delayed[0][0] - now
+        return None
+
+    def _prune(self, now: float):
+        for chat_id in [c for c, b in self._chats.items() if b.is_idle(now)]:
+            del self._chats[chat_id]
+
+    def stats(self) -> dict:
+        """
+        Returns backlog, sent/retry counters and queueing latency (in seconds,
+        over the last 1000 sends) for each priority.
+        """
+        return {
+            name: self._stats[priority].snapshot()
+            for priority, name in _PRIORITY_NAMES.items()
+        }
+
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        for queue in self._queues.values():
+            for entry in queue:
+                if not entry[-1].done():
+                    entry[-1].cancel()
+        self._queues.clear()
+        self._ready.clear()
+        self._delayed.clear()
@@ -7,18 +7,77 @@ CREATE TABLE IF NOT EXISTS users (
 );
 """
 
+CREATE_TRACKS_TABLE = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    artist_name TEXT NOT NULL,
+    album_name TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
 CREATE_LIKED_TRACKS_TABLE = """
 CREATE TABLE IF NOT EXISTS liked_tracks (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
     track_id TEXT NOT NULL,
-    track_name TEXT NOT NULL,
-    artist_name TEXT NOT NULL,
-    album_name TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (track_id) REFERENCES tracks (id),
     UNIQUE(user_id, track_id)
 );
 """
 
+# Moves the per-user metadata of a liked_tracks table created before the tracks
+# catalog into the catalog (the newest like wins) and rebuilds the table in its
+# current shape. Mirrors alembic revision 3f9c1a7d2b60.
+UPGRADE_LIKED_TRACKS = (
+    """
+    INSERT OR IGNORE INTO tracks (id, name, artist_name, album_name)
+    SELECT track_id, track_name, artist_name, album_name
+    FROM liked_tracks
+    ORDER BY id DESC;
+    """,
+    """
+    CREATE TABLE liked_tracks_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        track_id TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (track_id) REFERENCES tracks (id),
+        UNIQUE(user_id, track_id)
+    );
+    """,
+    """
+    INSERT INTO liked_tracks_new (id, user_id, track_id)
+    SELECT id, user_id, track_id FROM liked_tracks;
+    """,
+    "DROP TABLE liked_tracks;",
+    "ALTER TABLE liked_tracks_new RENAME TO liked_tracks;",
+)
+
+# Rebuilds a playlist_tracks table created before the tracks catalog so that
+# it references the catalog.
+UPGRADE_PLAYLIST_TRACKS = (
+    """
+    CREATE TABLE playlist_tracks_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        playlist_id INTEGER NOT NULL,
+        track_id TEXT NOT NULL,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (playlist_id) REFERENCES playlists (id) ON DELETE CASCADE,
+        FOREIGN KEY (track_id) REFERENCES tracks (id),
+        UNIQUE(playlist_id, track_id)
+    );
+    """,
+    """
+    INSERT INTO playlist_tracks_new (id, playlist_id, track_id, added_at)
+    SELECT id, playlist_id, track_id, added_at FROM playlist_tracks;
+    """,
+    "DROP TABLE playlist_tracks;",
+    "ALTER TABLE playlist_tracks_new RENAME TO playlist_tracks;",
+)
+
 CREATE_PLAYLISTS_TABLE = """
 CREATE TABLE IF NOT EXISTS playlists (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -37,6 +96,150 @@ CREATE TABLE IF NOT EXISTS playlist_tracks (
     track_id TEXT NOT NULL,
     added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (playlist_id) REFERENCES playlists (id) ON DELETE CASCADE,
+    FOREIGN KEY (track_id) REFERENCES tracks (id),
     UNIQUE(playlist_id, track_id)
 );
 """
+
+CREATE_PREVIEW_FILES_TABLE = """
+CREATE TABLE IF NOT EXISTS preview_files (
+    url_hash TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# One row per track in a user's library (liked or in any of their playlists);
+# its id is the rowid of the track's entry in library_fts.
+CREATE_LIBRARY_TABLE = """
+CREATE TABLE IF NOT EXISTS library (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    track_id TEXT NOT NULL,
+    UNIQUE(user_id, track_id)
+);
+"""
+
+# `owner` holds the user id, so a search only walks that user's entries.
+CREATE_LIBRARY_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS library_fts USING fts5(
+    owner,
+    track_name,
+    artist_name,
+    album_name,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+UPSERT_TRACK = """
+INSERT INTO tracks (id, name, artist_name, album_name, updated_at)
+VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+ON CONFLICT(id) DO UPDATE SET
+    name = excluded.name,
+    artist_name = excluded.artist_name,
+    album_name = excluded.album_name,
+    updated_at = excluded.updated_at;
+"""
+
+# Takes the same parameters as UPSERT_TRACK.
+SYNC_LIBRARY_TRACK = """
+UPDATE library_fts
+SET track_name = ?2, artist_name = ?3, album_name = ?4
+WHERE rowid IN (SELECT id FROM library WHERE track_id = ?1)
+    AND (track_name IS NOT ?2 OR artist_name IS NOT ?3 OR album_name IS NOT ?4);
+"""
+
+ADD_TO_LIBRARY = """
+INSERT INTO library (user_id, track_id)
+VALUES (?, ?)
+ON CONFLICT(user_id, track_id) DO NOTHING
+RETURNING id;
+"""
+
+INDEX_LIBRARY_ENTRIES = """
+INSERT INTO library_fts (rowid, owner, track_name, artist_name, album_name)
+SELECT
+    l.id,
+    l.user_id,
+    COALESCE(t.name, ''),
+    COALESCE(t.artist_name, ''),
+    COALESCE(t.album_name, '')
+FROM library l
+LEFT JOIN tracks t ON t.id = l.track_id
+WHERE l.id IN (SELECT value FROM json_each(?));
+"""
+
+# Drops the given tracks (a JSON array of ids) from a user's library unless
+# they are still liked or in another of the user's playlists.
+PRUNE_LIBRARY = """
+DELETE FROM library
+WHERE user_id = ?
+    AND track_id IN (SELECT value FROM json_each(?))
+    AND NOT EXISTS (
+        SELECT 1 FROM liked_tracks lt
+        WHERE lt.user_id = library.user_id AND lt.track_id = library.track_id
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM playlist_tracks pt
+        JOIN playlists p ON p.id = pt.playlist_id
+        WHERE p.user_id = library.user_id AND pt.track_id = library.track_id
+    )
+RETURNING id;
+"""
+
+UNINDEX_LIBRARY_ENTRIES = """
+DELETE FROM library_fts WHERE rowid IN (SELECT value FROM json_each(?));
+"""
+
+# Fills the library from existing likes and playlists, e.g. for a database
+# created before the library existed.
+BACKFILL_LIBRARY = (
+    """
+    INSERT OR IGNORE INTO library (user_id, track_id)
+    SELECT user_id, track_id FROM liked_tracks
+    UNION
+    SELECT p.user_id, pt.track_id
+    FROM playlist_tracks pt
+    JOIN playlists p ON p.id = pt.playlist_id;
+    """,
+    """
+    INSERT INTO library_fts (rowid, owner, track_name, artist_name, album_name)
+    SELECT
+        l.id,
+        l.user_id,
+        COALESCE(t.name, ''),
+        COALESCE(t.artist_name, ''),
+        COALESCE(t.album_name, '')
+    FROM library l
+    LEFT JOIN tracks t ON t.id = l.track_id
+    WHERE l.id NOT IN (SELECT rowid FROM library_fts);
+    """,
+)
+
+CREATE_INDEXES = (
+    """
+    CREATE INDEX IF NOT EXISTS idx_playlists_user_created
+    ON playlists (user_id, created_at DESC, id, name);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_liked_tracks_track
+    ON liked_tracks (track_id);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_liked_tracks_user
+    ON liked_tracks (user_id, id);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_playlist_tracks_track
+    ON playlist_tracks (track_id);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_playlist_tracks_playlist
+    ON playlist_tracks (playlist_id, id);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_library_track
+    ON library (track_id);
+    """,
+)
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from config.settings import WORKER_SHUTDOWN_TIMEOUT
+from src.utils.hashring import HashRing
+
+# Slots of the send limits shared by the workers; see `SharedChatLimits`.
+GROUP_LIMIT_SLOTS = 4096
+
+
+def _event(update: Update) -> Any:
+    try:
+        return update.event
+    except Exception:
+        return None
+
+
+def user_key(update: Update) -> int:
+    """
+    Returns the id of the user who caused the update, else its chat, else the
+    update itself.
+    """
+    event = _event(update)
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    return update.update_id
+
+
+def _run_bot_worker(index: int, workers: int, queue: Any, group_limits: Any):
+    # Ctrl+C reaches the whole process group; the supervisor stops the workers.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Imported in the child so that the supervisor does not open the bot's resources.
+    from src.telegram_bot import bot
+
+    asyncio.run(bot.run_worker(index, workers, queue, group_limits))
+
+
+class WorkerPool:
+    """
+    Runs `workers` processes and sends each update to one of them, picked by a
+    consistent hash of its user, so all updates from a user are handled by the
+    same process in the order they arrived. A dead worker is restarted on the
+    next update routed to it and picks up the updates queued for it.
+    - target: Run in each child as target(index, workers, queue, group_limits);
+      it must handle (key, update) items from the queue until it receives None.
+      `group_limits` is the array backing the `SharedChatLimits` of the pool,
+      as a group's members may be served by different workers.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        target: Callable[[int, int, Any, Any], None] = _run_bot_worker,
+    ):
+        self.workers = workers
+        self.target = target
+        self._context = multiprocessing.get_context("spawn")
+        self.queues = [self._context.Queue() for _ in range(workers)]
+        self.group_limits = self._context.Array("d", GROUP_LIMIT_SLOTS)
+        self.processes: List[Optional[multiprocessing.process.BaseProcess]] = [
+            None
+        ] * workers
+        self.ring: HashRing[int] = HashRing(range(workers))
+        self.routed = [0] * workers
+        self.restarts = 0
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=self.target,
+            args=(index, self.workers, self.queues[index], self.group_limits),
+            name=f"bot-worker-{index}",
+        )
+        process.start()
+        self.processes[index] = process
+        logging.info(f"Запущен воркер {index} (pid {process.pid}).")
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def route(self, key: int, update: Dict[str, Any]) -> int:
+        index = self.ring.get(key)
+        process = self.processes[index]
+        if process is None or not process.is_alive():
+            logging.warning(f"Воркер {index} не работает, перезапуск.")
+            self.restarts += 1
+            self._spawn(index)
+        self.queues[index].put((key, update))
+        self.routed[index] += 1
+        return index
+
+    def stop(self, timeout: float = WORKER_SHUTDOWN_TIMEOUT):
+        """
+        Asks every worker to finish its queued updates and waits for it; workers
+        still running after `timeout` seconds are terminated.
+        """
+        for queue in self.queues:
+            queue.put(None)
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                logging.warning(f"Воркер {index} не завершился вовремя.")
+                process.terminate()
+                process.join()
+        for queue in self.queues:
+            queue.close()
+            queue.join_thread()
+
+    def stats(self) -> dict:
+        return {"routed": list(self.routed), "restarts": self.restarts}
+
+
+class RoutingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware of the supervisor's dispatcher: hands every update
+    to the worker pool instead of processing it in this process.
+    """
+
+    def __init__(self, pool: WorkerPool):
+        super().__init__()
+        self.pool = pool
+
+    async def __call__(self, handler, event: TelegramObject, data: dict):
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        self.pool.route(
+            user_key(event),
+            event.model_dump(mode="json", exclude_none=True, by_alias=True),
+        )
+
+
+async def serve_queue(bot: Bot, dp: Dispatcher, queue: Any):
+    """
+    Feeds the updates sent by the supervisor to the worker's dispatcher until it
+    receives None, then waits for the ones still being processed. Each update
+    runs in its own task, started in arrival order; per-user ordering is kept by
+    the dispatcher's `UserExecutor`.
+    """
+    loop = asyncio.get_running_loop()
+    tasks: Set[asyncio.Task] = set()
+
+    async def process(update: Dict[str, Any]):
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            logging.error(f"Ошибка обработки обновления {update.get('update_id')}: {e}")
+
+    while True:
+        item = await loop.run_in_executor(None, queue.get)
+        if item is None:
+            break
+        _, update = item
+        task = asyncio.create_task(process(update))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.wait(set(tasks))
+
+
+async def run_supervisor(
+    bot: Bot,
+    dp: Dispatcher,
+    workers: int,
+    serve: Callable[[Bot, Dispatcher], Awaitable[None]],
+):
+    """
+    Starts the worker pool and receives updates with `serve` (polling or
+    webhook), routing them to the workers.
+    """
+    pool = WorkerPool(workers)
+    pool.start()
+    dp.update.outer_middleware(RoutingMiddleware(pool))
+    try:
+        await serve(bot, dp)
+    finally:
+        await asyncio.get_running_loop().run_in_executor(None, pool.stop)
+        logging.info(f"Статистика воркеров: {pool.stats()}")
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import signal
+from typing import Any, Optional
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from config.settings import (
+    WEBHOOK_DRAIN_TIMEOUT,
+    WEBHOOK_HOST,
+    WEBHOOK_MAX_IN_FLIGHT,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Webhook endpoint that answers Telegram with 200 right away and processes the
+    update in the background, with at most `max_in_flight` updates being processed
+    at once. When all slots are busy the acknowledgement waits for a free one, so
+    Telegram slows down instead of the bot piling up tasks.
+    On shutdown new updates are refused (Telegram delivers them again later) and
+    the ones in flight get up to `drain_timeout` seconds to finish.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        max_in_flight: int = WEBHOOK_MAX_IN_FLIGHT,
+        drain_timeout: float = WEBHOOK_DRAIN_TIMEOUT,
+        secret_token: Optional[str] = WEBHOOK_SECRET,
+        **data: Any,
+    ):
+        super().__init__(
+            dispatcher,
+            bot,
+            handle_in_background=True,
+            secret_token=secret_token,
+            **data,
+        )
+        self.drain_timeout = drain_timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._closing = False
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def _handle_request_background(
+        self, bot: Bot, request: web.Request
+    ) -> web.Response:
+        if self._closing:
+            return web.Response(status=503)
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process_update(bot, update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _process_update(self, bot: Bot, update: dict):
+        try:
+            await self._background_feed_update(bot=bot, update=update)
+        except Exception as e:
+            logging.error(f"Ошибка обработки обновления {update.get('update_id')}: {e}")
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        """
+        Stops accepting updates and waits for the ones in flight. The bot session
+        stays open; it is closed together with the other resources in `bot.main`.
+        """
+        self._closing = True
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        logging.info(f"Ожидание завершения {len(tasks)} обновлений...")
+        _, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logging.warning(f"Прервано {len(pending)} незавершённых обновлений.")
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """
+    Serves updates over a webhook until SIGINT/SIGTERM.
+    If WEBHOOK_URL is set, the webhook is registered with Telegram; without it the
+    server only listens locally, e.g. for recorded updates sent by
+    `scripts/post_updates.py`.
+    """
+    app = web.Application()
+    handler = BoundedRequestHandler(dp, bot)
+    handler.register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    logging.info(f"Вебхук слушает {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            max_connections=min(WEBHOOK_MAX_IN_FLIGHT, 100),
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    try:
+        await stop.wait()
+    finally:
+        logging.info("Остановка вебхука...")
+        await runner.cleanup()
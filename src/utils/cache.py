@@ -1,28 +1,390 @@
+import asyncio
+import inspect
+import json
+import logging
+import sys
+import threading
 import time
+from collections import OrderedDict
 from functools import wraps
-from typing import Callable, Any, Dict, Tuple
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
 
-_cache: Dict[Tuple[str, Tuple[Any, ...], frozenset], Tuple[Any, float]] = {}
+from config.settings import CACHE_MAX_BYTES, CACHE_MAX_ENTRIES
+from src.utils.disk_cache import DiskCache
 
+_MISSING = object()
 
-def cache_res(ttl: int = 60) -> Callable:
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+    stale_until: float
+    size: int
+
+
+def approx_size(obj: Any, _depth: int = 0) -> int:
+    """
+    Roughly estimates how many bytes an object occupies, including nested
+    containers (JSON-like payloads from the Spotify API are the common case).
+    """
+    size = sys.getsizeof(obj)
+    if _depth > 8:
+        return size
+    if isinstance(obj, dict):
+        size += sum(
+            approx_size(k, _depth + 1) + approx_size(v, _depth + 1)
+            for k, v in obj.items()
+        )
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item, _depth + 1) for item in obj)
+    return size
+
+
+class TTLCache:
+    """
+    An in-memory LRU cache with per-entry time-to-live.
+    - max_entries: Maximum number of entries kept at once.
+    - max_bytes: Approximate memory budget for the stored values.
+    - default_ttl: Time-to-live, in seconds, used when `set` gets no ttl.
+
+    Expired entries are dropped lazily on access and periodically by
+    `purge_expired` (see `start_sweeper`). Keys are ``(namespace, key)`` pairs so
+    that each decorated function can be invalidated on its own.
+    An entry set with `stale_ttl` is kept that much longer after it expires;
+    `get` no longer returns it, but `get_stale` does.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        default_ttl: float = 60,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._sweeper: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        full_key = (namespace, key)
+        with self._lock:
+            entry = self._data.get(full_key)
+            if entry is None:
+                self.misses += 1
+                return default
+            now = time.monotonic()
+            if entry.expires_at <= now:
+                if entry.stale_until <= now:
+                    self._remove(full_key)
+                    self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(full_key)
+            self.hits += 1
+            return entry.value
+
+    def get_stale(
+        self, namespace: str, key: Hashable, default: Any = None
+    ) -> Tuple[Any, bool]:
+        """
+        Like `get`, but also returns expired entries that are still within their
+        stale window. Returns ``(value, is_stale)``.
+        """
+        full_key = (namespace, key)
+        with self._lock:
+            entry = self._data.get(full_key)
+            now = time.monotonic()
+            if entry is None or entry.stale_until <= now:
+                if entry is not None:
+                    self._remove(full_key)
+                    self.expirations += 1
+                self.misses += 1
+                return default, False
+            self._data.move_to_end(full_key)
+            if entry.expires_at <= now:
+                self.stale_hits += 1
+                return entry.value, True
+            self.hits += 1
+            return entry.value, False
+
+    def set(
+        self,
+        namespace: str,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        stale_ttl: float = 0,
+    ):
+        ttl = self.default_ttl if ttl is None else ttl
+        size = approx_size(value)
+        if size > self.max_bytes:
+            return
+        full_key = (namespace, key)
+        with self._lock:
+            if full_key in self._data:
+                self._remove(full_key)
+            expires_at = time.monotonic() + ttl
+            self._data[full_key] = _Entry(
+                value, expires_at, expires_at + stale_ttl, size
+            )
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, namespace: str, key: Hashable) -> bool:
+        with self._lock:
+            if (namespace, key) not in self._data:
+                return False
+            self._remove((namespace, key))
+            return True
+
+    def invalidate(self, namespace: Optional[str] = None) -> int:
+        """
+        Drops every entry of a namespace, or the whole cache if none is given.
+        Returns the number of removed entries.
+        """
+        with self._lock:
+            if namespace is None:
+                removed = len(self._data)
+                self._data.clear()
+                self._bytes = 0
+                return removed
+            keys = [k for k in self._data if k[0] == namespace]
+            for k in keys:
+                self._remove(k)
+            return len(keys)
+
+    def purge_expired(self) -> int:
+        """
+        Removes all expired entries and returns how many were dropped.
+        """
+        now = time.monotonic()
+        with self._lock:
+            keys = [k for k, entry in self._data.items() if entry.stale_until <= now]
+            for k in keys:
+                self._remove(k)
+            self.expirations += len(keys)
+            return len(keys)
+
+    def _remove(self, full_key: Tuple[str, Hashable]):
+        entry = self._data.pop(full_key)
+        self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def start_sweeper(self, interval: float = 60):
+        """
+        Starts a background task that purges expired entries every `interval` seconds.
+        Must be called from a running event loop.
+        """
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(
+                self._sweep(interval)
+            )
+
+    async def stop_sweeper(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def _sweep(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self.purge_expired()
+
+
+default_cache = TTLCache()
+
+
+def _make_key(args: tuple, kwargs: dict) -> Optional[Hashable]:
+    key = (args, frozenset(kwargs.items()))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _disk_key(args: tuple, kwargs: dict) -> Optional[str]:
+    try:
+        return json.dumps([args, sorted(kwargs.items())], separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+
+
+def cache_res(
+    ttl: int = 60,
+    namespace: Optional[str] = None,
+    cache: Optional[TTLCache] = None,
+    stale_ttl: float = 0,
+    persist: Optional[DiskCache] = None,
+) -> Callable:
     """
     A decorator for caching function results in memory.
+    Works for both regular and `async def` functions; for coroutines the awaited
+    result is cached, not the coroutine object.
     - ttl: Time-to-live for cached items, in seconds.
+    - namespace: Cache namespace, defaults to the function's qualified name.
+    - cache: The TTLCache to store results in, defaults to `default_cache`.
+    - stale_ttl: Grace period after `ttl` during which an `async def` function's
+      expired result is still returned at once while a background call refreshes
+      it (stale-while-revalidate). If the refresh fails, the stale result stays.
+    - persist: A DiskCache to keep an `async def` function's results across
+      restarts. Memory misses read through to it, and new results are written
+      to both tiers. A leading `self`/`cls` argument is left out of the disk key,
+      and calls whose arguments are not JSON-serializable are not persisted.
+
+    The wrapped function gets `cache_invalidate(*args, **kwargs)` to drop a single
+    result, `cache_clear()` to drop all of its results, and `cache_get`/`cache_set`
+    to read or fill the entry for given arguments without calling the function.
+    `cache_get` only looks in memory; an `async def` function also gets
+    `await cache_lookup(*args, **kwargs)`, which answers like a call would (stale
+    results and the disk tier included) but returns None instead of calling it.
+    Invalidation drops results from both tiers.
     """
 
-    def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        def wrapped(*args, **kwargs):
-            key = (func.__qualname__, args, frozenset(kwargs.items()))
-            if key in _cache:
-                value, timestamp = _cache[key]
-                if time.time() - timestamp < ttl:
+    def decorator(func: Callable) -> Any:
+        store = cache if cache is not None else default_cache
+        ns = namespace or f"{func.__module__}.{func.__qualname__}"
+
+        params = list(inspect.signature(func).parameters)
+        skip = 1 if params and params[0] in ("self", "cls") else 0
+
+        def store_result(key: Hashable, args: tuple, kwargs: dict, value: Any):
+            store.set(ns, key, value, ttl, stale_ttl)
+            if persist is not None:
+                disk_key = _disk_key(args[skip:], kwargs)
+                if disk_key is not None:
+                    persist.put(ns, disk_key, value, ttl, stale_ttl)
+
+        if inspect.iscoroutinefunction(func):
+            refreshing: Dict[Hashable, asyncio.Task] = {}
+
+            async def refresh(key: Hashable, args: tuple, kwargs: dict):
+                try:
+                    store_result(key, args, kwargs, await func(*args, **kwargs))
+                except Exception as e:
+                    logging.warning(f"Не удалось обновить {ns}: {e}")
+                finally:
+                    refreshing.pop(key, None)
+
+            def schedule_refresh(key: Hashable, args: tuple, kwargs: dict):
+                if key not in refreshing:
+                    refreshing[key] = asyncio.ensure_future(refresh(key, args, kwargs))
+
+            async def read_through(key: Hashable, args: tuple, kwargs: dict) -> Any:
+                if persist is None:
+                    return _MISSING
+                disk_key = _disk_key(args[skip:], kwargs)
+                hit = None if disk_key is None else await persist.get(ns, disk_key)
+                if hit is None:
+                    return _MISSING
+                value, ttl_left, stale_left = hit
+                store.set(
+                    ns, key, value, max(ttl_left, 0), stale_left - max(ttl_left, 0)
+                )
+                if ttl_left <= 0:
+                    schedule_refresh(key, args, kwargs)
+                return value
+
+            async def lookup(key: Hashable, args: tuple, kwargs: dict) -> Any:
+                value, stale = store.get_stale(ns, key, _MISSING)
+                if value is not _MISSING:
+                    if stale:
+                        schedule_refresh(key, args, kwargs)
+                    return value
+                return await read_through(key, args, kwargs)
+
+            @wraps(func)
+            async def async_wrapped(*args, **kwargs):
+                key = _make_key(args, kwargs)
+                if key is None:
+                    return await func(*args, **kwargs)
+                value = await lookup(key, args, kwargs)
+                if value is not _MISSING:
+                    return value
+                result = await func(*args, **kwargs)
+                store_result(key, args, kwargs, result)
+                return result
+
+            async def cache_lookup(*args, **kwargs) -> Any:
+                key = _make_key(args, kwargs)
+                if key is None:
+                    return None
+                value = await lookup(key, args, kwargs)
+                return None if value is _MISSING else value
+
+            wrapped: Any = async_wrapped
+            wrapped.cache_lookup = cache_lookup
+        else:
+
+            @wraps(func)
+            def sync_wrapped(*args, **kwargs):
+                key = _make_key(args, kwargs)
+                if key is None:
+                    return func(*args, **kwargs)
+                value = store.get(ns, key, _MISSING)
+                if value is not _MISSING:
                     return value
-            result = func(*args, **kwargs)
-            _cache[key] = (result, time.time())
-            return result
+                result = func(*args, **kwargs)
+                store.set(ns, key, result, ttl)
+                return result
+
+            wrapped = sync_wrapped
+
+        def cache_invalidate(*args, **kwargs) -> bool:
+            if persist is not None:
+                disk_key = _disk_key(args[skip:], kwargs)
+                if disk_key is not None:
+                    persist.delete(ns, disk_key)
+            key = _make_key(args, kwargs)
+            return key is not None and store.delete(ns, key)
+
+        def cache_clear() -> int:
+            if persist is not None:
+                persist.invalidate(ns)
+            return store.invalidate(ns)
+
+        def cache_get(*args, **kwargs) -> Any:
+            key = _make_key(args, kwargs)
+            return None if key is None else store.get(ns, key)
+
+        def cache_set(value: Any, *args, **kwargs):
+            key = _make_key(args, kwargs)
+            if key is not None:
+                store_result(key, args, kwargs, value)
 
+        wrapped.cache_invalidate = cache_invalidate
+        wrapped.cache_get = cache_get
+        wrapped.cache_set = cache_set
+        wrapped.cache_clear = cache_clear
+        wrapped.cache_namespace = ns
         return wrapped
 
     return decorator
@@ -0,0 +1,100 @@
+import logging
+import time
+from collections import Counter
+from typing import Optional
+
+
+class CircuitOpenError(Exception):
+    """
+    The call was rejected because the circuit breaker is open.
+    - retry_in: Seconds until the breaker lets a probe call through, if known.
+    """
+
+    def __init__(self, message: str, retry_in: Optional[float] = None):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream for a while.
+    - closed: calls go through; `failure_threshold` consecutive failures open it.
+    - open: calls are rejected at once; after `reset_timeout` seconds the next
+      call is let through as a probe (half-open).
+    - half_open: one probe at a time; its success closes the breaker, its failure
+      opens it again.
+    Every state change is counted in `transitions` and logged.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.transitions: Counter = Counter()
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        self.transitions[f"{self.state}->{state}"] += 1
+        logging.warning(f"Предохранитель {self.name}: {self.state} -> {state}")
+        self.state = state
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+
+    def allow(self) -> bool:
+        """
+        Returns whether a call may go through now; a False result is counted
+        as rejected.
+        """
+        if (
+            self.state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout
+        ):
+            self._transition(self.HALF_OPEN)
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self._probing = False
+        self.failures = 0
+        self._transition(self.CLOSED)
+
+    def record_failure(self):
+        self._probing = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._transition(self.OPEN)
+
+    def release(self):
+        """
+        Ends a call that gave no verdict (e.g. it was cancelled).
+        """
+        self._probing = False
+
+    def retry_in(self) -> Optional[float]:
+        if self.state != self.OPEN:
+            return None
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+            "retry_in": self.retry_in(),
+        }
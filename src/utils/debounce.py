@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Debouncer:
+    """
+    Runs only the latest of rapid calls with the same key, e.g. per-keystroke
+    inline queries of one user. A call waits `delay` seconds first; if a newer
+    call with the same key arrives while it is waiting or running, it gives up
+    and returns None.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._latest: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.superseded = 0
+
+    def cancel(self, key: Hashable):
+        """
+        Supersedes the pending call for `key`, if any.
+        """
+        previous = self._latest.pop(key, None)
+        if previous is not None and not previous.done():
+            previous.set_result(None)
+            self.superseded += 1
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> Optional[T]:
+        """
+        Runs `func` after the debounce delay unless a newer call for `key` comes in.
+        A superseded `func` is left to finish in the background (so shared work such
+        as cache fills is not lost), but its result is no longer awaited.
+        """
+        self.cancel(key)
+        superseded = asyncio.get_running_loop().create_future()
+        self._latest[key] = superseded
+        try:
+            try:
+                await asyncio.wait_for(asyncio.shield(superseded), self.delay)
+                return None
+            except asyncio.TimeoutError:
+                pass
+
+            self.executed += 1
+            call = asyncio.ensure_future(func())
+            await asyncio.wait({call, superseded}, return_when=asyncio.FIRST_COMPLETED)
+            if call.done():
+                return call.result()
+            call.add_done_callback(_log_exception)
+            return None
+        finally:
+            if self._latest.get(key) is superseded:
+                del self._latest[key]
+
+
+def _log_exception(future: asyncio.Future):
+    if not future.cancelled() and future.exception() is not None:
+        logging.warning(f"Отменённый вызов завершился ошибкой: {future.exception()}")
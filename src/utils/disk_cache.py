@@ -0,0 +1,321 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+import aiosqlite
+from config.settings import (
+    DISK_CACHE_FLUSH_INTERVAL,
+    DISK_CACHE_MAX_BYTES,
+    DISK_CACHE_PATH,
+)
+
+CREATE_ENTRIES_TABLE = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+"""
+
+CREATE_ACCESSED_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed
+ON cache_entries (accessed_at);
+"""
+
+
+def _encode(value: Any) -> bytes:
+    return zlib.compress(
+        json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+    )
+
+
+def _decode(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+
+class DiskCache:
+    """
+    Persistent second tier behind `TTLCache`, stored in its own SQLite file so
+    cached results survive restarts. Values must be JSON-serializable; they are
+    stored as zlib-compressed compact JSON. Expiry uses wall-clock time.
+    Writes are buffered and committed together every `flush_interval` seconds,
+    after which least-recently-read entries are evicted down to `max_bytes`.
+    Deletions are buffered the same way and hide the deleted entries at once.
+    Errors are logged and treated as misses, the cache never fails a request.
+    - path: SQLite file, created on first use.
+    - max_bytes: Size budget for the stored (compressed) values.
+    - flush_interval: How long writes and access times are buffered.
+    """
+
+    def __init__(
+        self,
+        path: str = DISK_CACHE_PATH,
+        max_bytes: int = DISK_CACHE_MAX_BYTES,
+        flush_interval: float = DISK_CACHE_FLUSH_INTERVAL,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._connection: Optional[aiosqlite.Connection] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._pending: Dict[str, Tuple[bytes, float, float]] = {}
+        self._touched: Set[str] = set()
+        self._deleted: Set[str] = set()
+        self._invalidated: Set[str] = set()
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_now: Optional[asyncio.Event] = None
+        self._disabled = False
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(namespace: str, key: str) -> str:
+        return f"{namespace}\x00{key}"
+
+    @staticmethod
+    def _namespace_range(namespace: str) -> Tuple[str, str]:
+        return f"{namespace}\x00", f"{namespace}\x01"
+
+    async def _connect(self) -> Optional[aiosqlite.Connection]:
+        if self._connection is not None or self._disabled:
+            return self._connection
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._connection is not None or self._disabled:
+                return self._connection
+            try:
+                if self.path != ":memory:":
+                    Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                connection = await aiosqlite.connect(self.path)
+                await connection.execute("PRAGMA journal_mode = WAL;")
+                await connection.execute("PRAGMA synchronous = NORMAL;")
+                await connection.execute("PRAGMA busy_timeout = 5000;")
+                await connection.execute(CREATE_ENTRIES_TABLE)
+                await connection.execute(CREATE_ACCESSED_INDEX)
+                await connection.commit()
+            except (sqlite3.Error, OSError) as e:
+                logging.warning(f"Дисковый кэш {self.path} отключён: {e}")
+                self._disabled = True
+                return None
+            self._connection = connection
+            logging.info(f"Дисковый кэш открыт: {self.path}")
+        return self._connection
+
+    async def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float, float]]:
+        """
+        Returns ``(value, ttl_left, stale_left)`` in seconds, or None on a miss.
+        `ttl_left` is negative for an expired entry still in its stale window.
+        """
+        full_key = self.make_key(namespace, key)
+        now = time.time()
+        row = self._pending.get(full_key)
+        if row is None and (
+            full_key in self._deleted or namespace in self._invalidated
+        ):
+            self.misses += 1
+            return None
+        if row is None:
+            connection = await self._connect()
+            if connection is None:
+                self.misses += 1
+                return None
+            try:
+                async with connection.execute(
+                    "SELECT value, expires_at, stale_until "
+                    "FROM cache_entries WHERE key = ?",
+                    (full_key,),
+                ) as cursor:
+                    stored = await cursor.fetchone()
+                if stored is not None:
+                    row = (stored[0], stored[1], stored[2])
+            except sqlite3.Error as e:
+                self.errors += 1
+                logging.warning(f"Ошибка чтения дискового кэша: {e}")
+                row = None
+        if row is None or row[2] <= now:
+            self.misses += 1
+            return None
+        try:
+            value = _decode(row[0])
+        except (zlib.error, ValueError) as e:
+            self.errors += 1
+            logging.warning(f"Повреждённая запись дискового кэша: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.add(full_key)
+        self._schedule_flush()
+        return value, row[1] - now, row[2] - now
+
+    def put(
+        self, namespace: str, key: str, value: Any, ttl: float, stale_ttl: float = 0
+    ):
+        """
+        Buffers a value for the next flush. Values that cannot be encoded as JSON
+        are skipped.
+        """
+        try:
+            blob = _encode(value)
+        except (TypeError, ValueError):
+            return
+        expires_at = time.time() + ttl
+        self._pending[self.make_key(namespace, key)] = (
+            blob,
+            expires_at,
+            expires_at + stale_ttl,
+        )
+        self._schedule_flush()
+
+    def delete(self, namespace: str, key: str):
+        """
+        Drops one entry. It is no longer returned from now on and is removed
+        from the file on the next flush.
+        """
+        full_key = self.make_key(namespace, key)
+        self._pending.pop(full_key, None)
+        self._touched.discard(full_key)
+        self._deleted.add(full_key)
+        self._schedule_flush()
+
+    def invalidate(self, namespace: str):
+        """
+        Drops every entry of a namespace, the same way as `delete`.
+        """
+        start, end = self._namespace_range(namespace)
+
+        def outside(full_key: str) -> bool:
+            return not start <= full_key < end
+
+        self._pending = {k: v for k, v in self._pending.items() if outside(k)}
+        self._touched = set(filter(outside, self._touched))
+        self._deleted = set(filter(outside, self._deleted))
+        self._invalidated.add(namespace)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flusher is None or self._flusher.done():
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._flush_now = asyncio.Event()
+            self._flusher = loop.create_task(self._delayed_flush(self._flush_now))
+
+    async def _delayed_flush(self, flush_now: asyncio.Event):
+        try:
+            await asyncio.wait_for(flush_now.wait(), self.flush_interval)
+        except asyncio.TimeoutError:
+            pass
+        await self.flush()
+
+    async def flush(self):
+        """
+        Applies buffered deletions, then writes buffered entries and access times
+        in one transaction, then evicts.
+        """
+        if not (self._pending or self._touched or self._deleted or self._invalidated):
+            return
+        pending, self._pending = self._pending, {}
+        touched, self._touched = self._touched, set()
+        deleted, self._deleted = self._deleted, set()
+        invalidated, self._invalidated = self._invalidated, set()
+        connection = await self._connect()
+        if connection is None:
+            return
+        now = time.time()
+        try:
+            await connection.executemany(
+                "DELETE FROM cache_entries WHERE key >= ? AND key < ?",
+                [self._namespace_range(namespace) for namespace in invalidated],
+            )
+            await connection.executemany(
+                "DELETE FROM cache_entries WHERE key = ?",
+                [(key,) for key in deleted],
+            )
+            await connection.executemany(
+                "INSERT OR REPLACE INTO cache_entries "
+                "(key, value, size, expires_at, stale_until, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (key, blob, len(blob), expires_at, stale_until, now)
+                    for key, (blob, expires_at, stale_until) in pending.items()
+                ],
+            )
+            await connection.executemany(
+                "UPDATE cache_entries SET accessed_at = ? WHERE key = ?",
+                [(now, key) for key in touched - pending.keys()],
+            )
+            await self._evict(connection, now)
+            await connection.commit()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logging.warning(f"Ошибка записи дискового кэша: {e}")
+            await connection.rollback()
+            # Dropped writes are only lost, but deletions must not be undone.
+            self._deleted |= deleted
+            self._invalidated |= invalidated
+            return
+        self.writes += len(pending)
+
+    async def _evict(self, connection: aiosqlite.Connection, now: float):
+        cursor = await connection.execute(
+            "DELETE FROM cache_entries WHERE stale_until <= ?", (now,)
+        )
+        self.evictions += max(cursor.rowcount, 0)
+        await cursor.close()
+        async with connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache_entries"
+        ) as cursor:
+            stored = await cursor.fetchone()
+        total = stored[0] if stored is not None else 0
+        if total <= self.max_bytes:
+            return
+        # Free a little more than needed so that eviction does not run on every flush.
+        to_free = total - self.max_bytes * 0.9
+        doomed = []
+        async with connection.execute(
+            "SELECT key, size FROM cache_entries ORDER BY accessed_at"
+        ) as cursor:
+            async for key, size in cursor:
+                doomed.append((key,))
+                to_free -= size
+                if to_free <= 0:
+                    break
+        await connection.executemany("DELETE FROM cache_entries WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flush_now.set()
+            await self._flusher
+        self._flusher = None
+        await self.flush()
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "pending": len(self._pending),
+            "pending_deletes": len(self._deleted) + len(self._invalidated),
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+default_disk_cache = DiskCache()
@@ -0,0 +1,46 @@
+import bisect
+import hashlib
+from typing import Dict, Generic, Hashable, Iterable, List, TypeVar
+
+T = TypeVar("T", bound=Hashable)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+    )
+
+
+class HashRing(Generic[T]):
+    """
+    Consistent hash ring: maps keys to nodes so that the same key always lands
+    on the same node, and adding or removing a node only moves about 1/N of the
+    keys. Each node is placed on the ring `replicas` times to even out the load.
+    """
+
+    def __init__(self, nodes: Iterable[T] = (), replicas: int = 100):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: Dict[int, T] = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: T):
+        for i in range(self.replicas):
+            point = _hash(f"{node}:{i}")
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+                self._owners[point] = node
+
+    def remove(self, node: T):
+        for i in range(self.replicas):
+            point = _hash(f"{node}:{i}")
+            if self._owners.get(point) == node:
+                del self._owners[point]
+                self._points.remove(point)
+
+    def get(self, key: Hashable) -> T:
+        if not self._points:
+            raise LookupError("Кольцо пустое.")
+        index = bisect.bisect(self._points, _hash(str(key))) % len(self._points)
+        return self._owners[self._points[index]]